@@ -5,7 +5,10 @@ Allows fine-tuning of Kelly and Ken's personalities, prompts, and behaviors
 
 import json
 import os
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from string import Formatter
+from functools import cached_property, lru_cache
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
@@ -28,6 +31,57 @@ class PersonalityTrait(Enum):
     EMPATHETIC = "empathetic"
     CONFIDENT = "confident"
 
+# Extra instructions added to every prompt for each teaching style
+TEACHING_STYLE_CONTEXT = {
+    TeachingStyle.ACADEMIC: "Focus on building a solid theoretical foundation with clear explanations and multiple examples.",
+    TeachingStyle.PRACTICAL: "Emphasize real-world applications and hands-on learning with immediate practical value.",
+    TeachingStyle.CONVERSATIONAL: "Use a friendly, conversational tone that makes complex topics accessible and engaging.",
+    TeachingStyle.TECHNICAL: "Provide detailed technical explanations with precise terminology and comprehensive coverage.",
+    TeachingStyle.CREATIVE: "Use creative analogies, visual descriptions, and innovative approaches to make learning memorable."
+}
+
+# Rendered prompts kept by each customizer, least recently used dropped first
+PROMPT_CACHE_SIZE = 1024
+
+@lru_cache(maxsize=256)
+def compile_template(template: str) -> Optional[Tuple[Tuple[str, ...], Tuple[str, ...]]]:
+    """
+    Split a prompt template into its literal text and field names.
+    Returns None when a field uses a format spec, conversion, index or
+    attribute, which are left to str.format.
+    """
+    literals, fields = [], []
+    pending = ""
+    for literal, field, format_spec, conversion in Formatter().parse(template):
+        # Escaped braces split the literal text without starting a field
+        pending += literal
+        if field is None:
+            continue
+        if not field.isidentifier() or format_spec or conversion:
+            return None
+        literals.append(pending)
+        fields.append(field)
+        pending = ""
+    literals.append(pending)
+    return tuple(literals), tuple(fields)
+
+def render_template(template: str, **values) -> str:
+    """Fill in a prompt template, equivalent to template.format(**values)"""
+    compiled = compile_template(template)
+    if compiled is None:
+        return template.format(**values)
+    
+    return fill_template(compiled, values)
+
+def fill_template(compiled: Tuple[Tuple[str, ...], Tuple[str, ...]], values: Dict) -> str:
+    """Join a compiled template's literal text with the values of its fields"""
+    literals, fields = compiled
+    parts = [literals[0]]
+    for field, literal in zip(fields, literals[1:]):
+        parts.append(str(values[field]))
+        parts.append(literal)
+    return "".join(parts)
+
 @dataclass
 class AvatarConfig:
     """Configuration for an avatar"""
@@ -41,6 +95,15 @@ class AvatarConfig:
     content_preferences: Dict[str, str]
     interaction_style: str
     example_phrases: List[str]
+    
+    @cached_property
+    def trait_values(self) -> Tuple[str, ...]:
+        """Values of the personality traits, cached until they change"""
+        return tuple(t.value for t in self.personality_traits)
+    
+    def refresh_trait_values(self):
+        """Drop the cached trait values after personality_traits changes"""
+        self.__dict__.pop('trait_values', None)
 
 class AvatarCustomizer:
     """Main class for customizing avatar personalities"""
@@ -48,10 +111,13 @@ class AvatarCustomizer:
     def __init__(self, config_file: str = "avatar_configs.json"):
         self.config_file = config_file
         self.avatars = {}
+        # Rendered prompts keyed by their arguments and the config fields they read
+        self._prompt_cache: "OrderedDict[tuple, str]" = OrderedDict()
         self.load_configs()
     
     def load_configs(self):
         """Load avatar configurations from file"""
+        self._prompt_cache.clear()
         if os.path.exists(self.config_file):
             with open(self.config_file, 'r') as f:
                 data = json.load(f)
@@ -62,6 +128,8 @@ class AvatarCustomizer:
     
     def save_configs(self):
         """Save avatar configurations to file"""
+        # Every customization saves, so this is where cached prompts go stale
+        self._prompt_cache.clear()
         data = {}
         for name, config in self.avatars.items():
             data[name] = self._avatar_config_to_dict(config)
@@ -90,7 +158,7 @@ class AvatarCustomizer:
             'name': config.name,
             'role': config.role,
             'teaching_style': config.teaching_style.value,
-            'personality_traits': [t.value for t in config.personality_traits],
+            'personality_traits': list(config.trait_values),
             'expertise_areas': config.expertise_areas,
             'voice_characteristics': config.voice_characteristics,
             'prompt_templates': config.prompt_templates,
@@ -191,6 +259,7 @@ class AvatarCustomizer:
                 setattr(config, key, value)
             else:
                 print(f"⚠️  Unknown configuration key: {key}")
+        config.refresh_trait_values()
         
         self.save_configs()
         print(f"✅ Avatar '{avatar_name}' customized successfully")
@@ -205,6 +274,7 @@ class AvatarCustomizer:
         config = self.avatars[avatar_name]
         if trait not in config.personality_traits:
             config.personality_traits.append(trait)
+            config.refresh_trait_values()
             self.save_configs()
             print(f"✅ Added trait '{trait.value}' to {avatar_name}")
         else:
@@ -220,6 +290,7 @@ class AvatarCustomizer:
         config = self.avatars[avatar_name]
         if trait in config.personality_traits:
             config.personality_traits.remove(trait)
+            config.refresh_trait_values()
             self.save_configs()
             print(f"✅ Removed trait '{trait.value}' from {avatar_name}")
         else:
@@ -266,33 +337,78 @@ class AvatarCustomizer:
         if avatar_name not in self.avatars:
             return f"Error: Avatar '{avatar_name}' not found"
         
+        # Configs returned by get_avatar_config can be edited in place, so the key
+        # carries every field the prompt is built from rather than trusting a clear
+        config = self.avatars[avatar_name]
+        key = (
+            avatar_name, content_type, topic, tuple(sorted(kwargs.items())),
+            config.name, config.role, tuple(config.expertise_areas[:3]),
+            config.interaction_style, config.teaching_style,
+            config.prompt_templates.get(content_type)
+        )
+        try:
+            prompt = self._prompt_cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable template arguments are rendered without caching
+            return self._build_prompt(avatar_name, content_type, topic, **kwargs)
+        else:
+            self._prompt_cache.move_to_end(key)
+            return prompt
+        
+        prompt = self._prompt_cache[key] = self._build_prompt(avatar_name, content_type, topic, **kwargs)
+        if len(self._prompt_cache) > PROMPT_CACHE_SIZE:
+            self._prompt_cache.popitem(last=False)
+        return prompt
+    
+    def generate_custom_prompts(self, avatar_name: str, content_type: str, topics: List[str],
+                                **kwargs) -> List[str]:
+        """Generate custom prompts for several topics with the same avatar and template"""
+        if avatar_name not in self.avatars:
+            return [f"Error: Avatar '{avatar_name}' not found" for _ in topics]
+        
+        config = self.avatars[avatar_name]
+        prefix = self._prompt_prefix(config)
+        template = config.prompt_templates.get(content_type)
+        compiled = compile_template(template) if template is not None else None
+        
+        prompts = []
+        for topic in topics:
+            if compiled is None:
+                prompt = render_template(
+                    template or f"Create {content_type} content about {topic}", topic=topic, **kwargs
+                )
+            else:
+                prompt = fill_template(compiled, dict(topic=topic, **kwargs))
+            prompts.append(f"{prefix}\n\n{prompt}")
+        return prompts
+    
+    def _build_prompt(self, avatar_name: str, content_type: str, topic: str, **kwargs) -> str:
+        """Render a custom prompt from an avatar's configuration"""
         config = self.avatars[avatar_name]
         
         # Get the base template
         template = config.prompt_templates.get(content_type, f"Create {content_type} content about {topic}")
         
         # Format the template with the topic
-        prompt = template.format(topic=topic, **kwargs)
+        prompt = render_template(template, topic=topic, **kwargs)
+        
+        # Combine everything
+        full_prompt = f"{self._prompt_prefix(config)}\n\n{prompt}"
         
+        return full_prompt
+    
+    def _prompt_prefix(self, config: AvatarConfig) -> str:
+        """Personality introduction and teaching style instructions for an avatar"""
         # Add personality-specific elements
         personality_intro = f"As {config.name}, a {config.role} with expertise in {', '.join(config.expertise_areas[:3])}, "
         personality_intro += f"I approach this with a {config.interaction_style} style. "
         
         # Add teaching style context
-        style_context = {
-            TeachingStyle.ACADEMIC: "Focus on building a solid theoretical foundation with clear explanations and multiple examples.",
-            TeachingStyle.PRACTICAL: "Emphasize real-world applications and hands-on learning with immediate practical value.",
-            TeachingStyle.CONVERSATIONAL: "Use a friendly, conversational tone that makes complex topics accessible and engaging.",
-            TeachingStyle.TECHNICAL: "Provide detailed technical explanations with precise terminology and comprehensive coverage.",
-            TeachingStyle.CREATIVE: "Use creative analogies, visual descriptions, and innovative approaches to make learning memorable."
-        }
-        
-        style_instruction = style_context.get(config.teaching_style, "")
+        style_instruction = TEACHING_STYLE_CONTEXT.get(config.teaching_style, "")
         
-        # Combine everything
-        full_prompt = f"{personality_intro}{style_instruction}\n\n{prompt}"
-        
-        return full_prompt
+        return f"{personality_intro}{style_instruction}"
     
     def export_avatar_config(self, avatar_name: str, filename: str = None) -> str:
         """Export an avatar's configuration to a file"""
@@ -337,7 +453,7 @@ if __name__ == "__main__":
     kelly_config = customizer.get_avatar_config("kelly")
     if kelly_config:
         print(f"\nKelly's teaching style: {kelly_config.teaching_style.value}")
-        print(f"Kelly's traits: {[t.value for t in kelly_config.personality_traits]}")
+        print(f"Kelly's traits: {kelly_config.trait_values}")
     
     # Customize Kelly to be more creative
     customizer.add_personality_trait("kelly", PersonalityTrait.CREATIVE)
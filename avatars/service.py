@@ -3,6 +3,7 @@ Simplified Avatar Service
 Manages Kelly and Ken avatars with distinct personalities
 """
 
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from enum import Enum
 import logging
@@ -12,12 +13,43 @@ from .ken.personality import KenPersonality
 
 logger = logging.getLogger(__name__)
 
+# Keywords suggesting an academic or a practical topic
+ACADEMIC_SUBJECTS = (
+    "mathematics", "physics", "chemistry", "biology", "history", 
+    "literature", "philosophy", "theoretical", "research", "analysis"
+)
+
+PRACTICAL_SUBJECTS = (
+    "programming", "engineering", "business", "marketing", "design",
+    "cooking", "fitness", "crafts", "technology", "application"
+)
+
 
 class AvatarType(Enum):
     KELLY = "kelly"
     KEN = "ken"
 
 
+@lru_cache(maxsize=1024)
+def _select_avatar(topic: str, subject_area: Optional[str]) -> AvatarType:
+    """Pick an avatar from topic keywords; memoized because the same topics recur"""
+    # Simple heuristic for avatar selection
+    topic_lower = topic.lower()
+    subject_lower = (subject_area or "").lower()
+    
+    # Check if topic or subject area suggests academic focus
+    if any(term in topic_lower or term in subject_lower for term in ACADEMIC_SUBJECTS):
+        return AvatarType.KELLY
+    
+    # Check if topic or subject area suggests practical focus
+    elif any(term in topic_lower or term in subject_lower for term in PRACTICAL_SUBJECTS):
+        return AvatarType.KEN
+    
+    # Default to Kelly for general educational content
+    else:
+        return AvatarType.KELLY
+
+
 class SimplifiedAvatarService:
     """Simplified service for managing Kelly and Ken avatars"""
     
@@ -37,31 +69,7 @@ class SimplifiedAvatarService:
     
     def select_avatar_for_topic(self, topic: str, subject_area: str = None) -> AvatarType:
         """Select the best avatar for a given topic"""
-        # Simple heuristic for avatar selection
-        academic_subjects = [
-            "mathematics", "physics", "chemistry", "biology", "history", 
-            "literature", "philosophy", "theoretical", "research", "analysis"
-        ]
-        
-        practical_subjects = [
-            "programming", "engineering", "business", "marketing", "design",
-            "cooking", "fitness", "crafts", "technology", "application"
-        ]
-        
-        topic_lower = topic.lower()
-        subject_lower = (subject_area or "").lower()
-        
-        # Check if topic or subject area suggests academic focus
-        if any(term in topic_lower or term in subject_lower for term in academic_subjects):
-            return AvatarType.KELLY
-        
-        # Check if topic or subject area suggests practical focus
-        elif any(term in topic_lower or term in subject_lower for term in practical_subjects):
-            return AvatarType.KEN
-        
-        # Default to Kelly for general educational content
-        else:
-            return AvatarType.KELLY
+        return _select_avatar(topic, subject_area)
     
     def get_avatar_response(self, 
                           avatar_type: AvatarType,
@@ -87,7 +87,7 @@ class GenerationLogSerializer(serializers.ModelSerializer):
         model = GenerationLog
         fields = [
             'id', 'learning_objective', 'prompt_used', 'ai_response',
-            'generation_time', 'tokens_used', 'success', 'error_message',
+            'prompt_sha', 'response_sha', 'generation_time', 'tokens_used', 'success', 'error_message',
             'created_at'
         ]
         read_only_fields = ['id', 'created_at']
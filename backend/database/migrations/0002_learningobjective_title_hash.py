@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-16 09:00
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def populate_title_hash(apps, schema_editor):
+    LearningObjective = apps.get_model('database', 'LearningObjective')
+    for learning_objective in LearningObjective.objects.all().only('id', 'title'):
+        learning_objective.title_hash = hashlib.sha256(learning_objective.title.encode('utf-8')).hexdigest()
+        learning_objective.save(update_fields=['title_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningobjective',
+            name='title_hash',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 of the title, used to reuse generated content', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='learningobjective',
+            index=models.Index(fields=['title_hash'], name='database_le_title_h_464278_idx'),
+        ),
+        migrations.RunPython(populate_title_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-16 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0002_learningobjective_title_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationlog',
+            name='prompt_sha',
+            field=models.CharField(blank=True, help_text='SHA-256 of the prompt', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='generationlog',
+            name='response_sha',
+            field=models.CharField(blank=True, help_text='SHA-256 of the response', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='generationlog',
+            name='prompt_used',
+            field=models.TextField(blank=True, help_text='The prompt that was sent to the AI (failed generations only)'),
+        ),
+        migrations.AlterField(
+            model_name='generationlog',
+            name='ai_response',
+            field=models.TextField(blank=True, help_text='The response from the AI (failed generations only)'),
+        ),
+    ]
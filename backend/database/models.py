@@ -3,11 +3,25 @@ Database models for the Phoenix Knowledge Engine.
 Based on the technical architecture specifications.
 """
 
+import hashlib
 import uuid
 from django.db import models
 from django.utils import timezone
 
 
+def hash_title(title: str) -> str:
+    """
+    Content-address a learning objective title.
+    
+    Args:
+        title: The learning objective title
+        
+    Returns:
+        Hex SHA-256 digest of the title
+    """
+    return hashlib.sha256(title.encode('utf-8')).hexdigest()
+
+
 class LearningObjective(models.Model):
     """
     Core learning objective that serves as the main entity.
@@ -21,6 +35,7 @@ class LearningObjective(models.Model):
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255, help_text="The main topic or concept")
+    title_hash = models.CharField(max_length=64, blank=True, editable=False, help_text="SHA-256 of the title, used to reuse generated content")
     core_question = models.TextField(help_text="The central question this objective addresses")
     summary = models.TextField(help_text="Brief summary of the learning objective")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT')
@@ -33,10 +48,15 @@ class LearningObjective(models.Model):
         indexes = [
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['title_hash']),
         ]
     
     def __str__(self):
         return f"{self.title} ({self.status})"
+    
+    def save(self, *args, **kwargs):
+        self.title_hash = hash_title(self.title)
+        super().save(*args, **kwargs)
 
 
 class KnowledgeComponent(models.Model):
@@ -231,8 +251,10 @@ class GenerationLog(models.Model):
         on_delete=models.CASCADE, 
         related_name='generation_logs'
     )
-    prompt_used = models.TextField(help_text="The prompt that was sent to the AI")
-    ai_response = models.TextField(help_text="The response from the AI")
+    prompt_used = models.TextField(blank=True, help_text="The prompt that was sent to the AI (failed generations only)")
+    ai_response = models.TextField(blank=True, help_text="The response from the AI (failed generations only)")
+    prompt_sha = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the prompt")
+    response_sha = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the response")
     generation_time = models.FloatField(help_text="Time taken for generation in seconds")
     tokens_used = models.IntegerField(help_text="Number of tokens used")
     success = models.BooleanField(help_text="Whether the generation was successful")
@@ -2,11 +2,13 @@
 Orchestrator AI service for generating structured learning plans.
 """
 
+import hashlib
 import json
 import logging
 from typing import Dict, Any, List
 from django.conf import settings
 from services.local_llm import get_llm_service
+from services.generation_log_sink import generation_log_sink
 from database.models import LearningObjective, KnowledgeComponent, ComprehensionCheck, GenerationLog
 
 logger = logging.getLogger('phoenix.orchestrator')
@@ -148,15 +150,18 @@ class OrchestratorService:
             error_message: Error message if generation failed
         """
         try:
-            GenerationLog.objects.create(
+            generation_log_sink.put(GenerationLog(
                 learning_objective=learning_objective,
-                prompt_used=prompt,
-                ai_response=response,
+                # Full text is only kept for failed generations
+                prompt_used="" if success else prompt,
+                ai_response="" if success else response,
+                prompt_sha=hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+                response_sha=hashlib.sha256(response.encode('utf-8')).hexdigest(),
                 generation_time=0.0,  # Will be calculated in actual implementation
                 tokens_used=len(prompt.split()) + len(response.split()),
                 success=success,
                 error_message=error_message
-            )
+            ))
         except Exception as e:
             logger.error(f"Failed to log generation: {e}")
 
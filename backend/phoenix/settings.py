@@ -132,6 +132,8 @@ CORS_ALLOW_CREDENTIALS = True
 
 # OpenAI Configuration
 OPENAI_API_KEY = config('OPENAI_API_KEY')
+# Maximum in-flight OpenAI requests across all services
+OPENAI_MAX_CONCURRENCY = config('OPENAI_MAX_CONCURRENCY', default=50, cast=int)
 
 # Celery Configuration
 CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
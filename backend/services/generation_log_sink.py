@@ -0,0 +1,163 @@
+"""
+Generation log sink for batching GenerationLog inserts off the hot path.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from django.db import transaction
+
+from database.models import GenerationLog
+
+logger = logging.getLogger('phoenix.generation_log_sink')
+
+_STOP = object()
+
+
+class GenerationLogSink:
+    """
+    Buffers GenerationLog rows in a bounded queue and bulk-inserts them
+    from a background daemon thread.
+    Subclasses can set model and thread_name to batch other log rows.
+    """
+
+    model = GenerationLog
+    thread_name = 'generation-log-sink'
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 0.5, maxsize: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def put(self, log: GenerationLog):
+        """
+        Queue a GenerationLog row for insertion once the current
+        transaction commits, or straight away outside a transaction.
+
+        Rows logged inside a transaction that rolls back are dropped, since
+        the rows they reference are rolled back with it.
+        """
+        transaction.on_commit(lambda: self._enqueue(log))
+
+    def put_many(self, logs: List[GenerationLog]):
+        """Queue several rows with a single on-commit callback."""
+        transaction.on_commit(lambda: [self._enqueue(log) for log in logs])
+
+    def _enqueue(self, log: GenerationLog):
+        """Hand a row to the background writer, writing it synchronously if the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(log)
+        except queue.Full:
+            logger.warning("Generation log queue is full, writing synchronously")
+            self._write([log])
+
+    def flush(self):
+        """
+        Stop the background thread and write every queued row.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+
+        if batch:
+            self._write(batch)
+
+    def _ensure_started(self):
+        """Start the background writer on first use."""
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.thread_name, daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        """Collect rows into batches and bulk-insert them until stopped."""
+        while True:
+            batch, stop = self._collect_batch()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _collect_batch(self):
+        """
+        Block for the first row, then gather more until the batch is full
+        or the flush interval has elapsed.
+
+        Returns:
+            Tuple of (rows, stop_requested)
+        """
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def _write(self, batch: List[GenerationLog]):
+        """
+        Insert a batch of rows in a single query.
+
+        If the batch fails, its rows are retried one at a time so a single
+        bad row only loses itself.
+        """
+        try:
+            self.model.objects.bulk_create(batch, batch_size=self.batch_size)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Failed to write {self.model.__name__} row: {e}")
+                return
+            logger.warning(f"Failed to write {len(batch)} {self.model.__name__} rows, retrying one at a time: {e}")
+
+        failed = 0
+        for row in batch:
+            try:
+                self.model.objects.bulk_create([row])
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed to write {self.model.__name__} row: {e}")
+        if failed:
+            logger.error(f"Dropped {failed} of {len(batch)} {self.model.__name__} rows")
+
+
+# Global instance
+generation_log_sink = GenerationLogSink()
+atexit.register(generation_log_sink.flush)
@@ -5,19 +5,40 @@ Local LLM service using Ollama as a drop-in replacement for OpenAI.
 import requests
 import json
 import logging
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger('phoenix.local_llm')
 
 
+def _create_http_session() -> requests.Session:
+    """
+    Create an HTTP session with a keep-alive connection pool.
+    
+    Returns:
+        Configured requests Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=64)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# Shared by every LocalLLMService so connections are reused across calls
+_http_session = _create_http_session()
+
+
 class LocalLLMService:
     """
     OpenAI-compatible service using Ollama for local LLM inference.
     """
     
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    def __init__(self, base_url: str = "http://localhost:11434", session: Optional[requests.Session] = None):
         self.base_url = base_url
         self.default_model = "llama3.1:8b"
+        self.session = session or _http_session
         
     def chat_completions_create(
         self, 
@@ -53,7 +74,7 @@ class LocalLLMService:
             logger.info(f"Generating with Ollama model: {model}")
             logger.debug(f"Prompt: {prompt[:200]}...")
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/generate",
                 json={
                     "model": model,
@@ -147,7 +168,7 @@ class LocalLLMService:
             True if service is available, False otherwise
         """
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
             return response.status_code == 200
         except:
             return False
@@ -173,9 +194,11 @@ MODEL_CONFIGS = {
 }
 
 
+@lru_cache(maxsize=None)
 def get_llm_service(task_type: str = 'orchestrator') -> LocalLLMService:
     """
     Get a configured LLM service for a specific task type.
+    One instance is created per task type and reused.
     
     Args:
         task_type: Type of task ('orchestrator', 'worker', 'quality_control')
@@ -4,9 +4,27 @@ Token Usage Testing Script
 Tests our system without spending money on OpenAI API calls
 """
 
-import json
-import re
-from typing import Dict, List, Tuple
+from typing import Dict, List
+
+from orchestrator.prompts import ORCHESTRATOR_PROMPT_TEMPLATE
+from worker.prompts import (
+    LEARNING_OBJECTIVE_PROMPT_TEMPLATE, KNOWLEDGE_COMPONENT_PROMPT_TEMPLATE,
+    COMPREHENSION_CHECK_PROMPT_TEMPLATE, MODEL_BY_COMPONENT
+)
+
+# Price per 1K tokens (input, output)
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-3.5-turbo": (0.001, 0.002),
+}
+
+# Prefix used for each model's entries in the cost report
+COST_KEYS = {
+    "gpt-4": "gpt4",
+    "gpt-4-turbo": "gpt4_turbo",
+    "gpt-3.5-turbo": "gpt35",
+}
 
 def count_tokens_roughly(text: str) -> int:
     """
@@ -15,77 +33,30 @@ def count_tokens_roughly(text: str) -> int:
     """
     return len(text) // 4
 
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """
+    Rough token estimation for a batch of prompts in a single pass
+    """
+    return [len(text) // 4 for text in texts]
+
 def analyze_prompts() -> Dict[str, int]:
     """Analyze our prompts to estimate token usage"""
     
-    # Orchestrator prompt
-    orchestrator_prompt = """
-You are the Chief Learning Architect for our educational platform. Your task is to decompose the learning objective "{topic}" into a complete set of atomic knowledge components strictly following our schema.
-
-Generate a structured JSON output that defines the plan to populate these tables:
-1. `learning_objectives`: Title, Core Question, Summary.
-2. `knowledge_components`: A list of components with their `type` (CORE_CONCEPT, FACT, EXAMPLE, etc.), `content`, and `sort_order`.
-3. `comprehension_checks`: At least one multiple-choice question.
-
-Your output must be a valid JSON object that can be parsed by our system to generate subsequent, specific creation prompts. Be meticulous, logical, and ensure complete coverage of the topic.
-
-The JSON structure should be:
-{
-  "learning_objective": {
-    "title": "The topic title",
-    "core_question": "The central question this addresses",
-    "summary": "Brief summary of the learning objective"
-  },
-  "knowledge_components_plan": [
-    { "type": "CORE_CONCEPT", "purpose": "Define the main concept", "sort_order": 1 },
-    { "type": "FACT", "purpose": "State important facts", "sort_order": 2 },
-    { "type": "EXAMPLE", "purpose": "Provide concrete examples", "sort_order": 3 },
-    { "type": "PRINCIPLE", "purpose": "Explain key principles", "sort_order": 4 },
-    { "type": "ANALOGY", "purpose": "Create helpful analogies", "sort_order": 5 },
-    { "type": "WARNING", "purpose": "Highlight common mistakes", "sort_order": 6 }
-  ],
-  "comprehension_check_plan": {
-    "question_type": "multiple_choice",
-    "purpose": "Test understanding of the core concept"
-  }
-}
-
-Ensure the plan covers the topic comprehensively and follows educational best practices.
-"""
-    
-    # Worker prompts
-    summary_prompt = """You are a world-class curriculum designer. Write a concise and engaging summary for a learning objective. Do not add any other commentary.
-
-TOPIC: {topic}
-CORE_QUESTION: {core_question}
-
-SUMMARY:"""
-    
-    component_prompt = """You are an expert educator specializing in {component_type}. Create exactly one {component_type} for the following topic.
-
-TOPIC: {topic}
-COMPONENT_TYPE: {component_type}
-PURPOSE: {purpose}
-
-YOUR OUTPUT (ONLY THE {component_type} ITSELF):"""
-    
-    quiz_prompt = """You are an assessment designer. Create one multiple-choice question to test understanding of {topic}.
-
-- Generate 1 question with 4 plausible options.
-- Indicate the correct answer and provide a one-sentence explanation of why it is correct.
-- Format your output as a JSON object with the following keys: `question_text`, `options` (array), `correct_index` (integer), `explanation`.
-
-TOPIC: {topic}"""
-    
-    # Estimate token usage
+    # Estimate token usage from the same templates the services send
+    orchestrator_input, summary_input, component_input, quiz_input = count_tokens_batch([
+        ORCHESTRATOR_PROMPT_TEMPLATE,
+        LEARNING_OBJECTIVE_PROMPT_TEMPLATE,
+        KNOWLEDGE_COMPONENT_PROMPT_TEMPLATE,
+        COMPREHENSION_CHECK_PROMPT_TEMPLATE
+    ])
     estimates = {
-        "orchestrator_input": count_tokens_roughly(orchestrator_prompt),
+        "orchestrator_input": orchestrator_input,
         "orchestrator_output": 300,  # Estimated JSON response
-        "summary_input": count_tokens_roughly(summary_prompt),
+        "summary_input": summary_input,
         "summary_output": 150,  # Estimated summary length
-        "component_input": count_tokens_roughly(component_prompt),
+        "component_input": component_input,
         "component_output": 200,  # Average component length
-        "quiz_input": count_tokens_roughly(quiz_prompt),
+        "quiz_input": quiz_input,
         "quiz_output": 200,  # Estimated quiz JSON
         "quality_control_input": 200,  # Fact-checking prompt
         "quality_control_output": 50,  # Short approval/rejection
@@ -93,6 +64,11 @@ TOPIC: {topic}"""
     
     return estimates
 
+def price_tokens(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Cost in dollars of a token count for one model"""
+    input_price, output_price = MODEL_PRICES[model]
+    return (input_tokens * input_price + output_tokens * output_price) / 1000
+
 def calculate_costs(estimates: Dict[str, int]) -> Dict[str, float]:
     """Calculate costs for different OpenAI models"""
     
@@ -110,17 +86,24 @@ def calculate_costs(estimates: Dict[str, int]) -> Dict[str, float]:
         "total_input_tokens": total_input,
         "total_output_tokens": total_output,
         "total_tokens": total_input + total_output,
-        "gpt4_input_cost": total_input * 0.03 / 1000,
-        "gpt4_output_cost": total_output * 0.06 / 1000,
-        "gpt4_total_cost": (total_input * 0.03 + total_output * 0.06) / 1000,
-        "gpt4_turbo_input_cost": total_input * 0.01 / 1000,
-        "gpt4_turbo_output_cost": total_output * 0.03 / 1000,
-        "gpt4_turbo_total_cost": (total_input * 0.01 + total_output * 0.03) / 1000,
-        "gpt35_input_cost": total_input * 0.001 / 1000,
-        "gpt35_output_cost": total_output * 0.002 / 1000,
-        "gpt35_total_cost": (total_input * 0.001 + total_output * 0.002) / 1000,
     }
     
+    for model, key in COST_KEYS.items():
+        input_price, output_price = MODEL_PRICES[model]
+        costs[f"{key}_input_cost"] = total_input * input_price / 1000
+        costs[f"{key}_output_cost"] = total_output * output_price / 1000
+        costs[f"{key}_total_cost"] = price_tokens(model, total_input, total_output)
+    
+    # Mixed routing: components use MODEL_BY_COMPONENT and the quiz uses GPT-4 Turbo;
+    # the orchestrator, summary and quality control calls stay on GPT-4
+    other_input = total_input - estimates["component_input"] * 6 - estimates["quiz_input"]
+    other_output = total_output - estimates["component_output"] * 6 - estimates["quiz_output"]
+    mixed_cost = price_tokens("gpt-4", other_input, other_output)
+    mixed_cost += price_tokens("gpt-4-turbo", estimates["quiz_input"], estimates["quiz_output"])
+    for model in MODEL_BY_COMPONENT.values():
+        mixed_cost += price_tokens(model, estimates["component_input"], estimates["component_output"])
+    costs["mixed_routing_total_cost"] = mixed_cost
+    
     return costs
 
 def generate_test_plan() -> Dict[str, any]:
@@ -178,11 +161,13 @@ def main():
     print(f"GPT-4: ${costs['gpt4_total_cost']:.4f}")
     print(f"GPT-4 Turbo: ${costs['gpt4_turbo_total_cost']:.4f}")
     print(f"GPT-3.5 Turbo: ${costs['gpt35_total_cost']:.4f}")
+    print(f"Mixed routing: ${costs['mixed_routing_total_cost']:.4f}")
     
     print(f"\n📈 Monthly Cost Projections (100 lessons):")
     print(f"GPT-4: ${costs['gpt4_total_cost'] * 100:.2f}")
     print(f"GPT-4 Turbo: ${costs['gpt4_turbo_total_cost'] * 100:.2f}")
     print(f"GPT-3.5 Turbo: ${costs['gpt35_total_cost'] * 100:.2f}")
+    print(f"Mixed routing: ${costs['mixed_routing_total_cost'] * 100:.2f}")
     
     # Generate test plan
     test_plan = generate_test_plan()
@@ -3,6 +3,32 @@ Worker AI prompts for generating specific content components.
 Based on the technical architecture specifications.
 """
 
+from types import MappingProxyType
+
+LEARNING_OBJECTIVE_PROMPT_TEMPLATE = """You are a world-class curriculum designer. Write a concise and engaging summary for a learning objective. Do not add any other commentary.
+
+TOPIC: {topic}
+CORE_QUESTION: {core_question}
+
+SUMMARY:"""
+
+KNOWLEDGE_COMPONENT_PROMPT_TEMPLATE = """You are an expert educator specializing in {component_type}. Create exactly one {component_type} for the following topic.
+
+TOPIC: {topic}
+COMPONENT_TYPE: {component_type}
+PURPOSE: {purpose}
+
+YOUR OUTPUT (ONLY THE {component_type} ITSELF):"""
+
+COMPREHENSION_CHECK_PROMPT_TEMPLATE = """You are an assessment designer. Create one multiple-choice question to test understanding of {topic}.
+
+- Generate 1 question with 4 plausible options.
+- Indicate the correct answer and provide a one-sentence explanation of why it is correct.
+- Format your output as a JSON object with the following keys: `question_text`, `options` (array), `correct_index` (integer), `explanation`.
+
+TOPIC: {topic}"""
+
+
 def get_learning_objective_prompt(topic: str, core_question: str) -> str:
     """
     Generate prompt for creating learning objective summary.
@@ -14,12 +40,7 @@ def get_learning_objective_prompt(topic: str, core_question: str) -> str:
     Returns:
         Formatted prompt string
     """
-    return f"""You are a world-class curriculum designer. Write a concise and engaging summary for a learning objective. Do not add any other commentary.
-
-TOPIC: {topic}
-CORE_QUESTION: {core_question}
-
-SUMMARY:"""
+    return LEARNING_OBJECTIVE_PROMPT_TEMPLATE.format(topic=topic, core_question=core_question)
 
 
 def get_knowledge_component_prompt(topic: str, component_type: str, purpose: str) -> str:
@@ -34,13 +55,7 @@ def get_knowledge_component_prompt(topic: str, component_type: str, purpose: str
     Returns:
         Formatted prompt string
     """
-    return f"""You are an expert educator specializing in {component_type}. Create exactly one {component_type} for the following topic.
-
-TOPIC: {topic}
-COMPONENT_TYPE: {component_type}
-PURPOSE: {purpose}
-
-YOUR OUTPUT (ONLY THE {component_type} ITSELF):"""
+    return KNOWLEDGE_COMPONENT_PROMPT_TEMPLATE.format(topic=topic, component_type=component_type, purpose=purpose)
 
 
 def get_comprehension_check_prompt(topic: str) -> str:
@@ -53,13 +68,7 @@ def get_comprehension_check_prompt(topic: str) -> str:
     Returns:
         Formatted prompt string
     """
-    return f"""You are an assessment designer. Create one multiple-choice question to test understanding of {topic}.
-
-- Generate 1 question with 4 plausible options.
-- Indicate the correct answer and provide a one-sentence explanation of why it is correct.
-- Format your output as a JSON object with the following keys: `question_text`, `options` (array), `correct_index` (integer), `explanation`.
-
-TOPIC: {topic}"""
+    return COMPREHENSION_CHECK_PROMPT_TEMPLATE.format(topic=topic)
 
 
 # Component-specific prompts
@@ -90,6 +99,20 @@ COMPONENT_PROMPTS = {
     }
 }
 
+# Model routing per component type: cheaper models for low-complexity components
+MODEL_BY_COMPONENT = {
+    'CORE_CONCEPT': 'gpt-4-turbo',
+    'PRINCIPLE': 'gpt-4-turbo',
+    'ANALOGY': 'gpt-4-turbo',
+    'FACT': 'gpt-3.5-turbo',
+    'EXAMPLE': 'gpt-3.5-turbo',
+    'WARNING': 'gpt-3.5-turbo'
+}
+
+# Flattened read-only lookups built once at import
+_SYSTEM_PROMPTS = MappingProxyType({k: v['system_prompt'] for k, v in COMPONENT_PROMPTS.items()})
+_INSTRUCTIONS = MappingProxyType({k: v['instruction'] for k, v in COMPONENT_PROMPTS.items()})
+
 
 def get_component_system_prompt(component_type: str) -> str:
     """
@@ -101,7 +124,7 @@ def get_component_system_prompt(component_type: str) -> str:
     Returns:
         System prompt string
     """
-    return COMPONENT_PROMPTS.get(component_type, {}).get('system_prompt', 'You are an expert educator.')
+    return _SYSTEM_PROMPTS.get(component_type, 'You are an expert educator.')
 
 
 def get_component_instruction(component_type: str) -> str:
@@ -114,4 +137,17 @@ def get_component_instruction(component_type: str) -> str:
     Returns:
         Instruction string
     """
-    return COMPONENT_PROMPTS.get(component_type, {}).get('instruction', 'Create educational content for this topic.')
+    return _INSTRUCTIONS.get(component_type, 'Create educational content for this topic.')
+
+
+def get_component_model(component_type: str) -> str:
+    """
+    Get the model to use for a specific component type.
+    
+    Args:
+        component_type: Type of component
+        
+    Returns:
+        Model name
+    """
+    return MODEL_BY_COMPONENT.get(component_type, 'gpt-4')
@@ -2,11 +2,18 @@
 Worker AI service for generating specific content components.
 """
 
-import json
+import hashlib
 import logging
-from typing import Dict, Any, List
+import orjson
+from typing import Dict, Any, List, Optional
 from django.conf import settings
 from services.local_llm import get_llm_service
+from services.generation_log_sink import generation_log_sink
+from worker.prompts import (
+    get_learning_objective_prompt, get_knowledge_component_prompt,
+    get_comprehension_check_prompt, get_component_system_prompt,
+    get_component_model
+)
 from database.models import (
     LearningObjective, KnowledgeComponent, ComprehensionCheck, 
     GenerationLog
@@ -34,8 +41,6 @@ class WorkerService:
             Generated summary
         """
         try:
-            from worker.prompts import get_learning_objective_prompt
-            
             prompt = get_learning_objective_prompt(
                 learning_objective.title, 
                 learning_objective.core_question
@@ -60,7 +65,8 @@ class WorkerService:
             learning_objective.save()
             
             # Log the generation
-            self._log_generation(learning_objective, prompt, summary, True)
+            self._log_generation(learning_objective, prompt, summary, True,
+                                 tokens_used=self._reported_tokens(response))
             
             logger.info(f"Successfully generated summary for learning objective: {learning_objective.id}")
             return summary
@@ -85,8 +91,6 @@ class WorkerService:
             Created KnowledgeComponent instance
         """
         try:
-            from worker.prompts import get_knowledge_component_prompt, get_component_system_prompt
-            
             prompt = get_knowledge_component_prompt(
                 learning_objective.title, 
                 component_type, 
@@ -94,11 +98,12 @@ class WorkerService:
             )
             
             system_prompt = get_component_system_prompt(component_type)
+            model = get_component_model(component_type)
             
-            logger.info(f"Generating {component_type} component for learning objective: {learning_objective.id}")
+            logger.info(f"Generating {component_type} component for learning objective: {learning_objective.id} with {model}")
             
             response = self.client.chat.completions.create(
-                model="gpt-4",
+                model=model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
@@ -119,7 +124,8 @@ class WorkerService:
             )
             
             # Log the generation
-            self._log_generation(learning_objective, prompt, content, True)
+            self._log_generation(learning_objective, prompt, content, True,
+                                 tokens_used=self._reported_tokens(response))
             
             logger.info(f"Successfully generated {component_type} component: {knowledge_component.id}")
             return knowledge_component
@@ -140,24 +146,24 @@ class WorkerService:
             Created ComprehensionCheck instance
         """
         try:
-            from worker.prompts import get_comprehension_check_prompt
-            
             prompt = get_comprehension_check_prompt(learning_objective.title)
             
             logger.info(f"Generating comprehension check for learning objective: {learning_objective.id}")
             
+            # JSON mode guarantees the reply is a single valid JSON object
             response = self.client.chat.completions.create(
-                model="gpt-4",
+                model="gpt-4-turbo",
                 messages=[
                     {"role": "system", "content": "You are an expert assessment designer who creates fair, educational quiz questions."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=1000,
+                response_format={"type": "json_object"}
             )
             
             # Parse the JSON response
-            check_data = json.loads(response.choices[0].message.content)
+            check_data = orjson.loads(response.choices[0].message.content)
             
             # Create the comprehension check
             comprehension_check = ComprehensionCheck.objects.create(
@@ -170,16 +176,12 @@ class WorkerService:
             )
             
             # Log the generation
-            self._log_generation(learning_objective, prompt, response.choices[0].message.content, True)
+            self._log_generation(learning_objective, prompt, response.choices[0].message.content, True,
+                                 tokens_used=self._reported_tokens(response))
             
             logger.info(f"Successfully generated comprehension check: {comprehension_check.id}")
             return comprehension_check
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response for comprehension check: {e}")
-            self._log_generation(learning_objective, prompt, str(e), False, str(e))
-            raise ValueError(f"Invalid JSON response from AI: {e}")
-            
         except Exception as e:
             logger.error(f"Error generating comprehension check for learning objective {learning_objective.id}: {e}")
             self._log_generation(learning_objective, prompt, str(e), False, str(e))
@@ -198,6 +200,11 @@ class WorkerService:
             Dictionary containing generation results
         """
         try:
+            # Reuse content already generated for an identical topic
+            reused = self._reuse_existing_content(learning_objective, knowledge_components_plan)
+            if reused is not None:
+                return reused
+            
             # Generate summary
             summary = self.generate_learning_objective_summary(learning_objective)
             
@@ -239,8 +246,89 @@ class WorkerService:
                 'error': str(e)
             }
     
+    def _reuse_existing_content(self, learning_objective: LearningObjective,
+                                knowledge_components_plan: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Clone the content of a ready learning objective with the same title.
+        
+        Args:
+            learning_objective: The learning objective instance
+            knowledge_components_plan: List of component plans from orchestrator
+            
+        Returns:
+            Generation results if content was reused, None otherwise
+        """
+        if not learning_objective.title_hash:
+            return None
+        
+        source = (
+            LearningObjective.objects
+            .filter(title_hash=learning_objective.title_hash, status='READY')
+            .exclude(id=learning_objective.id)
+            .prefetch_related('knowledge_components', 'comprehension_checks')
+            .first()
+        )
+        if source is None:
+            return None
+        
+        source_components = list(source.knowledge_components.all())
+        source_checks = list(source.comprehension_checks.all())
+        planned_types = {component_plan['type'] for component_plan in knowledge_components_plan}
+        if not source_checks or {c.type for c in source_components} != planned_types:
+            return None
+        
+        knowledge_components = KnowledgeComponent.objects.bulk_create([
+            KnowledgeComponent(
+                learning_objective=learning_objective,
+                type=component.type,
+                content=component.content,
+                sort_order=component.sort_order,
+                validation_status=component.validation_status,
+                validation_notes=component.validation_notes
+            )
+            for component in source_components
+        ])
+        
+        source_check = source_checks[0]
+        comprehension_check = ComprehensionCheck.objects.create(
+            learning_objective=learning_objective,
+            question_text=source_check.question_text,
+            options=source_check.options,
+            correct_index=source_check.correct_index,
+            explanation=source_check.explanation,
+            validation_status=source_check.validation_status,
+            validation_notes=source_check.validation_notes
+        )
+        
+        learning_objective.summary = source.summary
+        learning_objective.status = 'READY'
+        learning_objective.save()
+        
+        logger.info(f"Reused content from learning objective {source.id} for: {learning_objective.id}")
+        
+        return {
+            'learning_objective': learning_objective,
+            'knowledge_components': knowledge_components,
+            'comprehension_check': comprehension_check,
+            'status': 'success'
+        }
+    
+    def _reported_tokens(self, response) -> Optional[int]:
+        """
+        Get the total token count reported by the API for a response.
+        
+        Args:
+            response: The chat completion response
+            
+        Returns:
+            Total tokens used, or None if the response has no usage data
+        """
+        usage = getattr(response, 'usage', None)
+        return getattr(usage, 'total_tokens', None)
+    
     def _log_generation(self, learning_objective: LearningObjective, prompt: str, 
-                       response: str, success: bool, error_message: str = ""):
+                       response: str, success: bool, error_message: str = "",
+                       tokens_used: Optional[int] = None):
         """
         Log the AI generation attempt.
         
@@ -250,17 +338,25 @@ class WorkerService:
             response: The response from AI
             success: Whether the generation was successful
             error_message: Error message if generation failed
+            tokens_used: Token count reported by the API; estimated from
+                the prompt and response when not available
         """
+        if tokens_used is None:
+            tokens_used = len(prompt.split()) + len(response.split())
+        
         try:
-            GenerationLog.objects.create(
+            generation_log_sink.put(GenerationLog(
                 learning_objective=learning_objective,
-                prompt_used=prompt,
-                ai_response=response,
+                # Full text is only kept for failed generations
+                prompt_used="" if success else prompt,
+                ai_response="" if success else response,
+                prompt_sha=hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+                response_sha=hashlib.sha256(response.encode('utf-8')).hexdigest(),
                 generation_time=0.0,  # Will be calculated in actual implementation
-                tokens_used=len(prompt.split()) + len(response.split()),
+                tokens_used=tokens_used,
                 success=success,
                 error_message=error_message
-            )
+            ))
         except Exception as e:
             logger.error(f"Failed to log generation: {e}")
 
@@ -0,0 +1,191 @@
+"""
+Bulk Lesson Batcher
+Offline lesson generation through the OpenAI Batch API
+"""
+
+import io
+import json
+import logging
+import time
+from typing import Dict, Any, List, Optional
+from django.conf import settings
+from openai import OpenAI
+from avatars.service import avatar_service, AvatarType
+from content.text.generator import (
+    TextContentGenerator, LESSON_COMPONENT_TYPES,
+    component_purpose, comprehension_check_purpose, error_quiz_data
+)
+
+logger = logging.getLogger('phoenix.content.batch')
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+FINISHED_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+
+class BulkLessonBatcher:
+    """
+    Generates lessons for many topics in one Batch API job.
+    Batch requests are billed at half price and completed within 24h,
+    so this suits catalogue back-fills rather than interactive requests.
+    """
+
+    def __init__(self, generator: Optional[TextContentGenerator] = None):
+        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.generator = generator or TextContentGenerator()
+
+    def prepare(self, topics: List[str], avatar_type: Optional[AvatarType] = None) -> bytes:
+        """
+        Build the JSONL batch input with one line per lesson request.
+        Avatars are selected per topic unless avatar_type is given.
+        Repeated topics are submitted once.
+        """
+        lines = []
+        # custom_id must be unique within a batch, and a repeat would be billed twice anyway
+        for topic in dict.fromkeys(topics):
+            topic_avatar = avatar_type or avatar_service.select_avatar_for_topic(topic)
+
+            requests = [('SUMMARY', self.generator.summary_request(topic, topic_avatar))]
+            requests += [
+                (component_type, self.generator.component_request(
+                    topic, component_type, component_purpose(topic, i), topic_avatar
+                ))
+                for i, component_type in enumerate(LESSON_COMPONENT_TYPES, 1)
+            ]
+            requests.append(('QUIZ', self.generator.comprehension_check_request(
+                topic, comprehension_check_purpose(topic), topic_avatar
+            )))
+
+            for part, body in requests:
+                lines.append(json.dumps({
+                    'custom_id': f"{topic}|{topic_avatar.value}|{part}",
+                    'method': 'POST',
+                    'url': BATCH_ENDPOINT,
+                    'body': body
+                }))
+
+        return ("\n".join(lines) + "\n").encode('utf-8')
+
+    def submit(self, topics: List[str], avatar_type: Optional[AvatarType] = None) -> str:
+        """
+        Upload the batch input and start the batch job.
+
+        Returns:
+            Batch job ID
+        """
+        payload = self.prepare(topics, avatar_type)
+        input_file = self.client.files.create(
+            file=('lessons.jsonl', io.BytesIO(payload)),
+            purpose='batch'
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window='24h'
+        )
+        logger.info(f"Submitted lesson batch {batch.id} for {len(set(topics))} topics")
+        return batch.id
+
+    def wait(self, batch_id: str, poll_interval: float = 60.0):
+        """Block until the batch job has finished and return it."""
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in FINISHED_STATUSES:
+                logger.info(f"Lesson batch {batch_id} finished with status: {batch.status}")
+                return batch
+            time.sleep(poll_interval)
+
+    def collect(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Download the batch output and assemble one lesson per topic,
+        in the same shape as TextContentGenerator.generate_complete_lesson.
+        Every submitted topic gets an entry; topics with no output at all
+        come back as failed lessons.
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status not in FINISHED_STATUSES:
+            raise ValueError(f"Batch {batch_id} has not finished (status: {batch.status})")
+
+        # The input file is the record of what was submitted
+        avatars: Dict[str, str] = {}
+        for record in self._read_jsonl(batch.input_file_id):
+            topic, avatar_value, _ = record['custom_id'].rsplit('|', 2)
+            avatars[topic] = avatar_value
+
+        # Failed requests are written to the error file rather than the output file
+        parts: Dict[str, Dict[str, Any]] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            for record in self._read_jsonl(file_id):
+                topic, avatar_value, part = record['custom_id'].rsplit('|', 2)
+                avatars.setdefault(topic, avatar_value)
+
+                response = record.get('response') or {}
+                if response.get('status_code') == 200:
+                    content = response['body']['choices'][0]['message']['content']
+                else:
+                    content = None
+                parts.setdefault(topic, {})[part] = content
+
+        lessons = {}
+        for topic, avatar_value in avatars.items():
+            if topic in parts:
+                lessons[topic] = self._assemble_lesson(topic, AvatarType(avatar_value), parts[topic])
+            else:
+                lessons[topic] = {
+                    'topic': topic,
+                    'avatar_used': avatar_value,
+                    'error': f"Missing from batch output (status: {batch.status})",
+                    'success': False
+                }
+        return lessons
+
+    def _read_jsonl(self, file_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Download a batch file and parse one JSON record per line."""
+        if not file_id:
+            return []
+        text = self.client.files.content(file_id).text
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    def _assemble_lesson(self, topic: str, avatar_type: AvatarType,
+                         topic_parts: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        """Build a lesson result from the raw content of each part."""
+        avatar = avatar_service.get_avatar(avatar_type)
+
+        summary = topic_parts.get('SUMMARY')
+        components = []
+        for component_type in LESSON_COMPONENT_TYPES:
+            content = topic_parts.get(component_type)
+            components.append({
+                'content': content.strip() if content else f"Error generating {component_type}",
+                'component_type': component_type,
+                'avatar_used': avatar.name,
+                'success': content is not None
+            })
+
+        quiz_content = topic_parts.get('QUIZ')
+        quiz_data = None
+        reason = "no quiz in batch output"
+        if quiz_content is not None:
+            try:
+                quiz_data = json.loads(quiz_content)
+            except ValueError as e:
+                reason = f"invalid quiz JSON: {e}"
+        if not isinstance(quiz_data, dict):
+            logger.error(f"Invalid comprehension check in batch output for topic: {topic}")
+            quiz_data = None
+
+        return {
+            'topic': topic,
+            'avatar_used': avatar_type.value,
+            'summary': {
+                'summary': summary.strip() if summary else "Error generating summary",
+                'avatar_used': avatar.name,
+                'success': summary is not None
+            },
+            'components': components,
+            'comprehension_check': {
+                'quiz_data': quiz_data if quiz_data is not None else error_quiz_data(reason),
+                'avatar_used': avatar.name,
+                'success': quiz_data is not None
+            },
+            'success': True
+        }
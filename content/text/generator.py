@@ -3,59 +3,245 @@ Text Content Generator
 Simplified text content generation for MVP
 """
 
+import asyncio
 import logging
-from typing import Dict, Any, List
-from django.conf import settings
-from services.local_llm import get_llm_service
+import threading
+import httpx
+import orjson
+from typing import Dict, Any, List, Optional
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from core.llm_client import (
+    RETRYABLE_ERRORS, LoopBoundSemaphore, get_shared_client, get_background_loop,
+    get_request_limiter, retry_delay, run_sync
+)
+from core.llm_cache import LLMCache, SemanticCache, llm_cache
 from avatars.service import avatar_service, AvatarType
+from content.topic_manager import TopicManager
 
 logger = logging.getLogger('phoenix.content.text')
 
+# Per-call timeouts so one stuck request fails fast into the retry path
+SUMMARY_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+COMPONENT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+QUIZ_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# Knowledge components generated for every lesson, in order
+LESSON_COMPONENT_TYPES = ('CORE_CONCEPT', 'FACT', 'EXAMPLE', 'PRINCIPLE', 'WARNING')
+
+# Every content type an avatar has a prompt modifier for
+CONTENT_TYPES = ('CORE_CONCEPT', 'FACT', 'EXAMPLE', 'PRINCIPLE', 'ANALOGY', 'WARNING')
+
+
+def component_purpose(topic: str, position: int) -> str:
+    """Purpose given to the nth knowledge component of a lesson."""
+    return f"Component {position} of the lesson about {topic}"
+
+
+def comprehension_check_purpose(topic: str) -> str:
+    """Purpose given to a lesson's comprehension check."""
+    return f"Test understanding of {topic}"
+
+
+def error_quiz_data(reason: str) -> Dict[str, Any]:
+    """Placeholder quiz returned when a comprehension check could not be generated."""
+    return {
+        'question_text': f"Error generating quiz: {reason}",
+        'options': ["Error", "Error", "Error", "Error"],
+        'correct_index': 0,
+        'explanation': "There was an error generating this quiz question."
+    }
+
 
 class TextContentGenerator:
     """
     Simplified text content generator.
-    Uses single model with avatar-specific prompts.
+    Uses single model with avatar-specific prompts and issues
+    the LLM calls for a lesson concurrently.
     """
     
-    def __init__(self):
-        self.client = get_llm_service('text_generator')
+    def __init__(self, max_concurrency: int = 20, cache: Optional[LLMCache] = None,
+                 semantic_cache: bool = False, max_attempts: int = 5,
+                 initial_backoff: float = 0.5, max_backoff: float = 30.0,
+                 client: Optional[AsyncOpenAI] = None):
+        self.client = client or get_shared_client()
         self.model = "gpt-3.5-turbo"  # Cost-effective model for MVP
+        # Caps in-flight requests so batches of lessons stay under rate limits
+        self._sem = LoopBoundSemaphore(max_concurrency)
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.cache = cache or llm_cache
+        # Opt-in: reuses answers for near-duplicate topics at the cost of an embedding call
+        self.semantic_cache = SemanticCache(self.client) if semantic_cache else None
+        # Avatar prompts never change, so build them once per generator
+        self._avatar_profiles = {
+            avatar_type: self._build_avatar_profile(avatar_type) for avatar_type in AvatarType
+        }
     
-    def generate_learning_objective_summary(self, 
-                                          topic: str, 
-                                          avatar_type: AvatarType = AvatarType.KELLY) -> Dict[str, Any]:
+    def _build_avatar_profile(self, avatar_type: AvatarType) -> Dict[str, Any]:
         """
-        Generate a learning objective summary using the specified avatar.
+        Collect the name and prompt text for an avatar.
         """
-        try:
-            avatar = avatar_service.get_avatar(avatar_type)
-            system_prompt = avatar.get_system_prompt()
-            
-            prompt = f"""Create a brief, engaging summary for a learning objective about "{topic}".
+        avatar = avatar_service.get_avatar(avatar_type)
+        return {
+            'name': avatar.name,
+            'system_prompt': avatar.get_system_prompt(),
+            'quiz_style': avatar.get_quiz_style(),
+            'modifiers': {
+                content_type: avatar.get_prompt_modifier(content_type)
+                for content_type in CONTENT_TYPES
+            },
+            'default_modifier': avatar.get_prompt_modifier(None)
+        }
+    
+    def _modifier(self, profile: Dict[str, Any], component_type: str) -> str:
+        """Get an avatar's prompt modifier for a content type."""
+        return profile['modifiers'].get(component_type, profile['default_modifier'])
+    
+    async def _chat(self, timeout: Optional[httpx.Timeout] = None, **kwargs):
+        """
+        Send a chat completion request, waiting for a free concurrency slot.
+        Identical requests are answered from the response cache, and
+        near-duplicates from the semantic cache when it is enabled.
+        """
+        key = self.cache.make_key(kwargs)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return ChatCompletion(**cached)
+        
+        embedding = None
+        if self.semantic_cache is not None:
+            embedding, cached = await self.semantic_cache.lookup(kwargs)
+            if cached is not None:
+                return ChatCompletion(**cached)
+        
+        response = await self._create_with_retry(timeout=timeout, **kwargs)
+        
+        response_data = response.model_dump()
+        await self.cache.set(key, response_data)
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(kwargs, embedding, response_data)
+        return response
+    
+    async def _create_with_retry(self, timeout: Optional[httpx.Timeout] = None, **kwargs):
+        """
+        Create a chat completion, retrying transient failures with
+        exponential backoff. The concurrency slot is released while waiting.
+        """
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                async with self._sem, get_request_limiter():
+                    return await self.client.chat.completions.create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_attempts:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                logger.warning(f"OpenAI request failed ({type(e).__name__}), "
+                               f"retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """
+        Get the wait before the next attempt, honouring Retry-After when sent.
+        """
+        return retry_delay(error, attempt, self.initial_backoff, self.max_backoff)
+    
+    def summary_request(self, topic: str, avatar_type: AvatarType) -> Dict[str, Any]:
+        """
+        Build the chat completion request for a learning objective summary.
+        """
+        profile = self._avatar_profiles[avatar_type]
+        # Static instructions live in the system message so the prefix is cacheable
+        system_prompt = f"""{profile['system_prompt']}
 
-{avatar.get_prompt_modifier('CORE_CONCEPT')}
+Create a brief, engaging summary for a learning objective about the given topic.
+
+{self._modifier(profile, 'CORE_CONCEPT')}
 
 Keep it to 2-3 sentences that capture the essence of what students will learn."""
+        
+        return {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f'Topic: "{topic}"'}
+            ],
+            'temperature': 0.7,
+            'max_tokens': 150
+        }
+    
+    def component_request(self, topic: str, component_type: str, purpose: str,
+                          avatar_type: AvatarType) -> Dict[str, Any]:
+        """
+        Build the chat completion request for a knowledge component.
+        """
+        profile = self._avatar_profiles[avatar_type]
+        system_prompt = f"""{profile['system_prompt']}
+
+Create {component_type.lower()} content about the given topic for the given purpose.
+{self._modifier(profile, component_type)}
+
+Keep it clear, educational, and appropriate for the content type."""
+        
+        return {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f'Topic: "{topic}"\nPurpose: {purpose}'}
+            ],
+            'temperature': 0.7,
+            'max_tokens': 300
+        }
+    
+    def comprehension_check_request(self, topic: str, purpose: str,
+                                    avatar_type: AvatarType) -> Dict[str, Any]:
+        """
+        Build the chat completion request for a comprehension check.
+        """
+        profile = self._avatar_profiles[avatar_type]
+        system_prompt = f"""{profile['system_prompt']}
+
+Create a multiple-choice quiz question about the given topic for the given purpose.
+{profile['quiz_style']}
+
+Reply with a JSON object with keys question_text, options (4 strings), correct_index (0-3) and explanation."""
+        
+        return {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f'Topic: "{topic}"\nPurpose: {purpose}'}
+            ],
+            'temperature': 0.7,
+            'max_tokens': 300,
+            # JSON mode guarantees the reply parses
+            'response_format': {"type": "json_object"}
+        }
+    
+    async def generate_learning_objective_summary(self, 
+                                                topic: str, 
+                                                avatar_type: AvatarType = AvatarType.KELLY) -> Dict[str, Any]:
+        """
+        Generate a learning objective summary using the specified avatar.
+        """
+        avatar_name = self._avatar_profiles[avatar_type]['name']
+        try:
+            logger.info(f"Generating summary for topic: {topic} with {avatar_name}")
             
-            logger.info(f"Generating summary for topic: {topic} with {avatar.name}")
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=150
+            response = await self._chat(
+                timeout=SUMMARY_TIMEOUT, **self.summary_request(topic, avatar_type)
             )
             
             summary = response.choices[0].message.content.strip()
             
-            logger.info(f"Successfully generated summary with {avatar.name}")
+            logger.info(f"Successfully generated summary with {avatar_name}")
             return {
                 'summary': summary,
-                'avatar_used': avatar.name,
+                'avatar_used': avatar_name,
                 'success': True
             }
             
@@ -63,49 +249,34 @@ Keep it to 2-3 sentences that capture the essence of what students will learn.""
             logger.error(f"Error generating summary: {e}")
             return {
                 'summary': f"Error generating summary: {str(e)}",
-                'avatar_used': avatar.name,
+                'avatar_used': avatar_name,
                 'success': False
             }
     
-    def generate_knowledge_component(self, 
-                                   topic: str,
-                                   component_type: str,
-                                   purpose: str,
-                                   avatar_type: AvatarType = AvatarType.KELLY) -> Dict[str, Any]:
+    async def generate_knowledge_component(self, 
+                                         topic: str,
+                                         component_type: str,
+                                         purpose: str,
+                                         avatar_type: AvatarType = AvatarType.KELLY) -> Dict[str, Any]:
         """
         Generate a knowledge component using the specified avatar.
         """
+        avatar_name = self._avatar_profiles[avatar_type]['name']
         try:
-            avatar = avatar_service.get_avatar(avatar_type)
-            system_prompt = avatar.get_system_prompt()
-            prompt_modifier = avatar.get_prompt_modifier(component_type)
-            
-            prompt = f"""Create {component_type.lower()} content about "{topic}".
-
-Purpose: {purpose}
-{prompt_modifier}
-
-Keep it clear, educational, and appropriate for the content type."""
+            logger.info(f"Generating {component_type} for topic: {topic} with {avatar_name}")
             
-            logger.info(f"Generating {component_type} for topic: {topic} with {avatar.name}")
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=300
+            response = await self._chat(
+                timeout=COMPONENT_TIMEOUT,
+                **self.component_request(topic, component_type, purpose, avatar_type)
             )
             
             content = response.choices[0].message.content.strip()
             
-            logger.info(f"Successfully generated {component_type} with {avatar.name}")
+            logger.info(f"Successfully generated {component_type} with {avatar_name}")
             return {
                 'content': content,
                 'component_type': component_type,
-                'avatar_used': avatar.name,
+                'avatar_used': avatar_name,
                 'success': True
             }
             
@@ -114,98 +285,70 @@ Keep it clear, educational, and appropriate for the content type."""
             return {
                 'content': f"Error generating {component_type}: {str(e)}",
                 'component_type': component_type,
-                'avatar_used': avatar.name,
+                'avatar_used': avatar_name,
                 'success': False
             }
     
-    def generate_comprehension_check(self, 
-                                   topic: str,
-                                   purpose: str,
-                                   avatar_type: AvatarType = AvatarType.KELLY) -> Dict[str, Any]:
+    async def generate_comprehension_check(self, 
+                                         topic: str,
+                                         purpose: str,
+                                         avatar_type: AvatarType = AvatarType.KELLY) -> Dict[str, Any]:
         """
         Generate a comprehension check using the specified avatar.
         """
+        avatar_name = self._avatar_profiles[avatar_type]['name']
         try:
-            avatar = avatar_service.get_avatar(avatar_type)
-            system_prompt = avatar.get_system_prompt()
-            quiz_style = avatar.get_quiz_style()
-            
-            prompt = f"""Create a multiple-choice quiz question about "{topic}".
-
-Purpose: {purpose}
-{quiz_style}
-
-Return your response in this exact JSON format:
-{{
-  "question_text": "Clear, specific question about {topic}",
-  "options": ["Option A", "Option B", "Option C", "Option D"],
-  "correct_index": 0,
-  "explanation": "Brief explanation of why the correct answer is right"
-}}"""
-            
-            logger.info(f"Generating comprehension check for topic: {topic} with {avatar.name}")
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=400
+            logger.info(f"Generating comprehension check for topic: {topic} with {avatar_name}")
+            
+            response = await self._chat(
+                timeout=QUIZ_TIMEOUT, **self.comprehension_check_request(topic, purpose, avatar_type)
             )
             
             # Parse the JSON response
-            import json
-            quiz_data = json.loads(response.choices[0].message.content)
+            quiz_data = orjson.loads(response.choices[0].message.content)
             
-            logger.info(f"Successfully generated comprehension check with {avatar.name}")
+            logger.info(f"Successfully generated comprehension check with {avatar_name}")
             return {
                 'quiz_data': quiz_data,
-                'avatar_used': avatar.name,
+                'avatar_used': avatar_name,
                 'success': True
             }
             
         except Exception as e:
             logger.error(f"Error generating comprehension check: {e}")
             return {
-                'quiz_data': {
-                    'question_text': f"Error generating quiz: {str(e)}",
-                    'options': ["Error", "Error", "Error", "Error"],
-                    'correct_index': 0,
-                    'explanation': "There was an error generating this quiz question."
-                },
-                'avatar_used': avatar.name,
+                'quiz_data': error_quiz_data(str(e)),
+                'avatar_used': avatar_name,
                 'success': False
             }
     
-    def generate_complete_lesson(self, 
-                               topic: str,
-                               avatar_type: AvatarType = AvatarType.KELLY) -> Dict[str, Any]:
+    async def generate_complete_lesson(self, 
+                                     topic: str,
+                                     avatar_type: AvatarType = AvatarType.KELLY) -> Dict[str, Any]:
         """
         Generate a complete lesson with all components using the specified avatar.
         """
         try:
             logger.info(f"Generating complete lesson for topic: {topic} with {avatar_type.value}")
             
-            # Generate summary
-            summary_result = self.generate_learning_objective_summary(topic, avatar_type)
-            
-            # Generate knowledge components
-            component_types = ['CORE_CONCEPT', 'FACT', 'EXAMPLE', 'PRINCIPLE', 'WARNING']
-            components = []
-            
-            for i, component_type in enumerate(component_types, 1):
-                purpose = f"Component {i} of the lesson about {topic}"
-                component_result = self.generate_knowledge_component(
-                    topic, component_type, purpose, avatar_type
+            # Issue the summary, component and quiz calls concurrently
+            tasks = [self.generate_learning_objective_summary(topic, avatar_type)]
+            tasks += [
+                self.generate_knowledge_component(
+                    topic, component_type, component_purpose(topic, i), avatar_type
                 )
-                components.append(component_result)
+                for i, component_type in enumerate(LESSON_COMPONENT_TYPES, 1)
+            ]
+            tasks.append(self.generate_comprehension_check(
+                topic, comprehension_check_purpose(topic), avatar_type
+            ))
             
-            # Generate comprehension check
-            check_result = self.generate_comprehension_check(
-                topic, f"Test understanding of {topic}", avatar_type
-            )
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+            
+            summary_result, *components, check_result = results
             
             return {
                 'topic': topic,
@@ -226,17 +369,74 @@ Return your response in this exact JSON format:
             }
 
 
-def generate_lesson_with_avatar(topic: str, avatar_preference: str = None) -> Dict[str, Any]:
+_topic_lock = threading.Lock()
+_topic_manager: Optional[TopicManager] = None
+
+
+def _get_topic_manager() -> TopicManager:
+    """Get the topic manager used to find related topics."""
+    global _topic_manager
+    with _topic_lock:
+        if _topic_manager is None:
+            _topic_manager = TopicManager()
+        return _topic_manager
+
+
+async def _prefetch_lessons(topics: List[str], avatar_type: Optional[AvatarType] = None):
+    """
+    Generate lessons for topics so their responses are already cached.
+    Each topic gets the avatar it would be served with unless avatar_type is given.
+    """
+    generator = TextContentGenerator()
+    await asyncio.gather(*(
+        generator.generate_complete_lesson(
+            topic, avatar_type or avatar_service.select_avatar_for_topic(topic)
+        )
+        for topic in topics
+    ), return_exceptions=True)
+    logger.info(f"Prefetched lessons for: {', '.join(topics)}")
+
+
+def prefetch_related_lessons(topic: str, avatar_type: Optional[AvatarType] = None):
+    """
+    Start generating lessons for topics related to the given one
+    without waiting for them.
+    """
+    try:
+        related = [t.name for t in _get_topic_manager().get_related_topics(topic)]
+    except Exception as e:
+        logger.warning(f"Could not find related topics for {topic}: {e}")
+        return
+    
+    if related:
+        asyncio.run_coroutine_threadsafe(
+            _prefetch_lessons(related, avatar_type), get_background_loop()
+        )
+
+
+def generate_lesson_with_avatar(topic: str, avatar_preference: str = None,
+                                prefetch: bool = False) -> Dict[str, Any]:
     """
     Generate a complete lesson with avatar selection.
+    Synchronous entry point for Django views.
+    With prefetch, lessons for related topics are also generated in the
+    background; each costs several completions, so it is off by default.
     """
     # Select avatar based on preference or topic
     if avatar_preference == 'ken':
-        avatar_type = AvatarType.KEN
+        preferred_avatar = AvatarType.KEN
     elif avatar_preference == 'kelly':
-        avatar_type = AvatarType.KELLY
+        preferred_avatar = AvatarType.KELLY
     else:
-        avatar_type = avatar_service.select_avatar_for_topic(topic)
+        preferred_avatar = None
+    avatar_type = preferred_avatar or avatar_service.select_avatar_for_topic(topic)
     
     generator = TextContentGenerator()
-    return generator.generate_complete_lesson(topic, avatar_type)
+    result = run_sync(generator.generate_complete_lesson(topic, avatar_type))
+    
+    if prefetch and result.get('success'):
+        # Related topics are served with their own avatar unless one was requested
+        prefetch_related_lessons(topic, preferred_avatar)
+    
+    return result
+
@@ -3,9 +3,15 @@ Topic Management System for Phoenix Knowledge Engine
 Manages educational topics, categories, and content generation
 """
 
-import json
+import atexit
 import os
 import random
+import threading
+import time
+import weakref
+import ijson
+import orjson
+from collections import Counter
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
@@ -37,9 +43,32 @@ class ContentType(Enum):
     PRINCIPLE = "principle"
     METHOD = "method"
 
+# Value -> member lookups, faster than calling the Enum when loading many topics
+_SUBJECT_BY_VALUE = {member.value: member for member in SubjectArea}
+_DIFFICULTY_BY_VALUE = {member.value: member for member in DifficultyLevel}
+_CONTENT_TYPE_BY_VALUE = {member.value: member for member in ContentType}
+
+# (epoch second, ISO timestamp) last formatted by now_iso
+_now_iso_cache = (0, "")
+
+def now_iso() -> str:
+    """Current local time as an ISO timestamp, to the second and formatted at most once a second"""
+    global _now_iso_cache
+    second = int(time.time())
+    if _now_iso_cache[0] != second:
+        _now_iso_cache = (second, datetime.fromtimestamp(second).isoformat())
+    return _now_iso_cache[1]
+
 @dataclass
 class Topic:
     """Represents an educational topic"""
+    # Declared by hand as dataclass(slots=True) needs Python 3.10
+    __slots__ = (
+        'name', 'subject_area', 'difficulty_level', 'content_type', 'description',
+        'key_concepts', 'learning_objectives', 'prerequisites', 'estimated_duration',
+        'tags', 'created_date', 'last_updated'
+    )
+    
     name: str
     subject_area: SubjectArea
     difficulty_level: DifficultyLevel
@@ -56,37 +85,176 @@ class Topic:
 class TopicManager:
     """Manages educational topics and content generation"""
     
-    def __init__(self, topics_file: str = "topics_database.json"):
+    def __init__(self, topics_file: str = "topics_database.json", save_delay: float = 0.5):
         self.topics_file = topics_file
+        # Mutations mark the store dirty; a timer coalesces bursts into one write
+        self.save_delay = save_delay
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self._save_lock = threading.RLock()
         self.topics = {}
         self.categories = {}
+        # Secondary indexes (subject/difficulty -> topic names), rebuilt lazily after changes
+        self._names: List[str] = []
+        self._by_subject: Dict[SubjectArea, List[str]] = {}
+        self._by_difficulty: Dict[DifficultyLevel, List[str]] = {}
+        # Lowercased name -> topic name, for resolving prerequisites
+        self._by_lower_name: Dict[str, str] = {}
+        # Trigram -> topic names, over lowercased name, description and tags
+        self._trigrams: Dict[str, set] = {}
+        # Topic name -> insertion rank, so index hits keep the topics' order
+        self._positions: Dict[str, int] = {}
+        self._next_position = 0
+        self._indexes_stale = True
+        # Statistics counters, kept up to date as topics are stored and removed
+        self._subject_counts = Counter()
+        self._difficulty_counts = Counter()
+        self._content_type_counts = Counter()
+        self._tag_counts = Counter()
+        self._total_duration = 0
         self.load_topics()
         self._create_default_topics()
+        _live_managers.add(self)
     
     def load_topics(self):
         """Load topics from file"""
         if os.path.exists(self.topics_file):
-            with open(self.topics_file, 'r') as f:
-                data = json.load(f)
-                for topic_name, topic_data in data.items():
-                    self.topics[topic_name] = self._dict_to_topic(topic_data)
+            # Stream one topic at a time instead of parsing the whole file up front
+            with open(self.topics_file, 'rb') as f:
+                for topic_name, topic_data in ijson.kvitems(f, '', use_float=True):
+                    self._put_topic(topic_name, self._dict_to_topic(topic_data))
+            self._mark_changed()
+    
+    def _put_topic(self, topic_name: str, topic: Topic):
+        """Store a topic, keeping the statistics counters in step"""
+        if topic_name in self.topics:
+            self._count_topic(self.topics[topic_name], -1)
+        self.topics[topic_name] = topic
+        self._count_topic(topic, 1)
+    
+    def _pop_topic(self, topic_name: str) -> Topic:
+        """Remove a topic, keeping the statistics counters in step"""
+        topic = self.topics.pop(topic_name)
+        self._count_topic(topic, -1)
+        return topic
+    
+    def _count_topic(self, topic: Topic, sign: int):
+        """Add (sign=1) or remove (sign=-1) a topic's contribution to the statistics"""
+        self._subject_counts[topic.subject_area] += sign
+        self._difficulty_counts[topic.difficulty_level] += sign
+        self._content_type_counts[topic.content_type] += sign
+        self._total_duration += sign * topic.estimated_duration
+        for tag in topic.tags:
+            self._tag_counts[tag] += sign
+    
+    def _mark_changed(self):
+        """Record that topics were added, removed or edited"""
+        self._indexes_stale = True
+    
+    def _rebuild_indexes(self):
+        """Rebuild the secondary indexes if topics changed since the last build"""
+        if not self._indexes_stale:
+            return
+        
+        self._names = []
+        self._by_lower_name = {}
+        self._by_subject = {}
+        self._by_difficulty = {}
+        self._trigrams = {}
+        self._positions = {}
+        self._next_position = 0
+        for name, topic in self.topics.items():
+            self._index_topic(name, topic)
+        self._indexes_stale = False
+    
+    def _index_topic(self, name: str, topic: Topic):
+        """Add one topic to the secondary indexes"""
+        self._names.append(name)
+        self._positions[name] = self._next_position
+        self._next_position += 1
+        self._by_lower_name[name.lower()] = name
+        self._by_subject.setdefault(topic.subject_area, []).append(name)
+        self._by_difficulty.setdefault(topic.difficulty_level, []).append(name)
+        for text in self._searchable_fields(topic):
+            for trigram in self._text_trigrams(text):
+                self._trigrams.setdefault(trigram, set()).add(name)
+    
+    def _unindex_topic(self, name: str, topic: Topic):
+        """Remove one topic from the secondary indexes"""
+        self._names.remove(name)
+        del self._positions[name]
+        if self._by_lower_name.get(name.lower()) == name:
+            del self._by_lower_name[name.lower()]
+        self._by_subject[topic.subject_area].remove(name)
+        self._by_difficulty[topic.difficulty_level].remove(name)
+        for text in self._searchable_fields(topic):
+            for trigram in self._text_trigrams(text):
+                postings = self._trigrams.get(trigram)
+                if postings is not None:
+                    postings.discard(name)
+                    if not postings:
+                        del self._trigrams[trigram]
+    
+    @staticmethod
+    def _searchable_fields(topic: Topic) -> List[str]:
+        """Lowercased fields matched by search_topics"""
+        return [topic.name.lower(), topic.description.lower()] + [tag.lower() for tag in topic.tags]
+    
+    @staticmethod
+    def _text_trigrams(text: str) -> set:
+        """All three-character substrings of text"""
+        return {text[i:i + 3] for i in range(len(text) - 2)}
     
     def save_topics(self):
         """Save topics to file"""
-        data = {}
-        for topic_name, topic in self.topics.items():
-            data[topic_name] = self._topic_to_dict(topic)
-        
-        with open(self.topics_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        with self._save_lock:
+            data = {}
+            for topic_name, topic in self.topics.items():
+                data[topic_name] = self._topic_to_dict(topic)
+            
+            self._write_json(self.topics_file, data)
+    
+    def _schedule_save(self):
+        """Mark topics dirty and start the save timer unless one is already pending"""
+        with self._save_lock:
+            self._dirty = True
+            # First write wins: a steady stream of edits must not keep pushing the save back
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+    
+    def flush(self):
+        """Write pending changes to disk now"""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            
+            self._dirty = False
+            try:
+                self.save_topics()
+            except Exception as e:
+                # Keep the changes pending so the next edit or flush retries the write
+                self._dirty = True
+                print(f"❌ Error saving topics: {e}")
+    
+    def _write_json(self, filename: str, data: dict):
+        """Write JSON via a temp file and rename so readers never see a partial file"""
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_filename, filename)
     
     def _dict_to_topic(self, data: dict) -> Topic:
         """Convert dictionary to Topic"""
         return Topic(
             name=data['name'],
-            subject_area=SubjectArea(data['subject_area']),
-            difficulty_level=DifficultyLevel(data['difficulty_level']),
-            content_type=ContentType(data['content_type']),
+            subject_area=_SUBJECT_BY_VALUE[data['subject_area']],
+            difficulty_level=_DIFFICULTY_BY_VALUE[data['difficulty_level']],
+            content_type=_CONTENT_TYPE_BY_VALUE[data['content_type']],
             description=data['description'],
             key_concepts=data['key_concepts'],
             learning_objectives=data['learning_objectives'],
@@ -134,8 +302,8 @@ class TopicManager:
                     prerequisites=["basic geometry", "squares and square roots"],
                     estimated_duration=45,
                     tags=["geometry", "algebra", "proofs"],
-                    created_date=datetime.now().isoformat(),
-                    last_updated=datetime.now().isoformat()
+                    created_date=now_iso(),
+                    last_updated=now_iso()
                 ),
                 
                 # Science
@@ -154,8 +322,8 @@ class TopicManager:
                     prerequisites=["basic biology", "cell structure"],
                     estimated_duration=60,
                     tags=["biology", "plants", "energy", "chemistry"],
-                    created_date=datetime.now().isoformat(),
-                    last_updated=datetime.now().isoformat()
+                    created_date=now_iso(),
+                    last_updated=now_iso()
                 ),
                 
                 # Economics
@@ -174,8 +342,8 @@ class TopicManager:
                     prerequisites=["basic math", "logical thinking"],
                     estimated_duration=50,
                     tags=["economics", "markets", "pricing"],
-                    created_date=datetime.now().isoformat(),
-                    last_updated=datetime.now().isoformat()
+                    created_date=now_iso(),
+                    last_updated=now_iso()
                 ),
                 
                 # Technology
@@ -194,8 +362,8 @@ class TopicManager:
                     prerequisites=["basic programming", "statistics"],
                     estimated_duration=75,
                     tags=["AI", "programming", "data science"],
-                    created_date=datetime.now().isoformat(),
-                    last_updated=datetime.now().isoformat()
+                    created_date=now_iso(),
+                    last_updated=now_iso()
                 ),
                 
                 # Language Arts
@@ -214,57 +382,70 @@ class TopicManager:
                     prerequisites=["reading comprehension", "writing skills"],
                     estimated_duration=90,
                     tags=["literature", "writing", "analysis"],
-                    created_date=datetime.now().isoformat(),
-                    last_updated=datetime.now().isoformat()
+                    created_date=now_iso(),
+                    last_updated=now_iso()
                 )
             ]
             
             for topic in default_topics:
-                self.topics[topic.name] = topic
+                self._put_topic(topic.name, topic)
             
+            self._mark_changed()
             self.save_topics()
     
     def add_topic(self, topic: Topic) -> bool:
         """Add a new topic"""
-        if topic.name in self.topics:
-            print(f"⚠️  Topic '{topic.name}' already exists")
-            return False
-        
-        self.topics[topic.name] = topic
-        self.save_topics()
+        # Mutate under the save lock so a flush never serialises a half-applied change
+        with self._save_lock:
+            if topic.name in self.topics:
+                print(f"⚠️  Topic '{topic.name}' already exists")
+                return False
+            
+            self._put_topic(topic.name, topic)
+            # Fresh indexes are patched in place; stale ones are rebuilt on next use anyway
+            if not self._indexes_stale:
+                self._index_topic(topic.name, topic)
+            self._schedule_save()
         print(f"✅ Added topic: {topic.name}")
         return True
     
     def update_topic(self, topic_name: str, **kwargs) -> bool:
         """Update an existing topic"""
-        if topic_name not in self.topics:
-            print(f"❌ Topic '{topic_name}' not found")
-            return False
-        
-        topic = self.topics[topic_name]
-        
-        # Update fields
-        for key, value in kwargs.items():
-            if hasattr(topic, key):
-                setattr(topic, key, value)
-            else:
-                print(f"⚠️  Unknown field: {key}")
-        
-        # Update timestamp
-        topic.last_updated = datetime.now().isoformat()
-        
-        self.save_topics()
+        with self._save_lock:
+            if topic_name not in self.topics:
+                print(f"❌ Topic '{topic_name}' not found")
+                return False
+            
+            topic = self.topics[topic_name]
+            
+            # Update fields
+            self._count_topic(topic, -1)
+            for key, value in kwargs.items():
+                if hasattr(topic, key):
+                    setattr(topic, key, value)
+                else:
+                    print(f"⚠️  Unknown field: {key}")
+            self._count_topic(topic, 1)
+            
+            # Update timestamp
+            topic.last_updated = now_iso()
+            
+            self._mark_changed()
+            self._schedule_save()
         print(f"✅ Updated topic: {topic_name}")
         return True
     
     def delete_topic(self, topic_name: str) -> bool:
         """Delete a topic"""
-        if topic_name not in self.topics:
-            print(f"❌ Topic '{topic_name}' not found")
-            return False
-        
-        del self.topics[topic_name]
-        self.save_topics()
+        with self._save_lock:
+            if topic_name not in self.topics:
+                print(f"❌ Topic '{topic_name}' not found")
+                return False
+            
+            topic = self._pop_topic(topic_name)
+            if not self._indexes_stale:
+                self._unindex_topic(topic_name, topic)
+            self._schedule_save()
         print(f"✅ Deleted topic: {topic_name}")
         return True
     
@@ -274,45 +455,60 @@ class TopicManager:
     
     def list_topics(self, subject_area: SubjectArea = None, difficulty: DifficultyLevel = None) -> List[Topic]:
         """List topics with optional filtering"""
-        topics = list(self.topics.values())
+        if subject_area and difficulty:
+            self._rebuild_indexes()
+            at_difficulty = set(self._by_difficulty.get(difficulty, ()))
+            return [self.topics[name] for name in self._by_subject.get(subject_area, ())
+                    if name in at_difficulty]
         
         if subject_area:
-            topics = [t for t in topics if t.subject_area == subject_area]
+            return self.get_topics_by_subject(subject_area)
         
         if difficulty:
-            topics = [t for t in topics if t.difficulty_level == difficulty]
+            return self.get_topics_by_difficulty(difficulty)
         
-        return topics
+        return list(self.topics.values())
     
     def search_topics(self, query: str) -> List[Topic]:
         """Search topics by name, description, or tags"""
         query_lower = query.lower()
-        results = []
+        self._rebuild_indexes()
         
-        for topic in self.topics.values():
-            if (query_lower in topic.name.lower() or 
-                query_lower in topic.description.lower() or 
-                any(query_lower in tag.lower() for tag in topic.tags)):
+        # Narrow to topics containing every trigram of the query, then confirm the substring match
+        candidates = self.topics.keys()
+        if len(query_lower) >= 3:
+            postings = sorted((self._trigrams.get(t, set()) for t in self._text_trigrams(query_lower)), key=len)
+            matched = postings[0].intersection(*postings[1:])
+            candidates = sorted(matched, key=self._positions.__getitem__)
+        
+        results = []
+        for name in candidates:
+            topic = self.topics[name]
+            if any(query_lower in field for field in self._searchable_fields(topic)):
                 results.append(topic)
         
         return results
     
     def get_random_topics(self, count: int = 5, subject_area: SubjectArea = None) -> List[Topic]:
         """Get random topics for content generation"""
-        available_topics = self.list_topics(subject_area)
+        self._rebuild_indexes()
+        names = self._by_subject.get(subject_area, []) if subject_area else self._names
         
-        if len(available_topics) <= count:
-            return available_topics
+        # Sample names and only resolve the picked topics
+        if len(names) > count:
+            names = random.sample(names, count)
         
-        return random.sample(available_topics, count)
+        return [self.topics[name] for name in names]
     
     def get_topics_by_difficulty(self, difficulty: DifficultyLevel) -> List[Topic]:
         """Get all topics of a specific difficulty level"""
-        return [topic for topic in self.topics.values() if topic.difficulty_level == difficulty]
+        self._rebuild_indexes()
+        return [self.topics[name] for name in self._by_difficulty.get(difficulty, ())]
     
     def get_topics_by_subject(self, subject_area: SubjectArea) -> List[Topic]:
         """Get all topics in a specific subject area"""
-        return [topic for topic in self.topics.values() if topic.subject_area == subject_area]
+        self._rebuild_indexes()
+        return [self.topics[name] for name in self._by_subject.get(subject_area, ())]
     
     def get_learning_path(self, topic_name: str) -> List[Topic]:
         """Get a learning path including prerequisites"""
@@ -322,17 +518,36 @@ class TopicManager:
         topic = self.topics[topic_name]
         path = []
         
-        # Add prerequisites
+        # Add prerequisites that name a known topic
+        self._rebuild_indexes()
         for prereq in topic.prerequisites:
-            matching_topics = self.search_topics(prereq)
-            if matching_topics:
-                path.extend(matching_topics)
+            prereq_name = self._by_lower_name.get(prereq.lower())
+            if prereq_name:
+                path.append(self.topics[prereq_name])
         
         # Add the main topic
         path.append(topic)
         
         return path
     
+    def get_related_topics(self, topic_name: str, limit: int = 5) -> List[Topic]:
+        """Get topics a learner is likely to open next: prerequisites, then same-subject siblings"""
+        if topic_name not in self.topics:
+            return []
+        
+        topic = self.topics[topic_name]
+        candidates = self.get_learning_path(topic_name)[:-1]
+        candidates += self.get_topics_by_subject(topic.subject_area)[:3]
+        
+        related = []
+        seen = {topic_name}
+        for candidate in candidates:
+            if candidate.name not in seen:
+                seen.add(candidate.name)
+                related.append(candidate)
+        
+        return related[:limit]
+    
     def generate_topic_suggestions(self, user_interests: List[str], count: int = 10) -> List[Topic]:
         """Generate topic suggestions based on user interests"""
         suggestions = []
@@ -355,55 +570,23 @@ class TopicManager:
     
     def get_topic_statistics(self) -> Dict:
         """Get statistics about the topic database"""
-        stats = {
+        # Assembled from the maintained counters, which are keyed by enum member;
+        # unary + drops values counted down to zero
+        return {
             'total_topics': len(self.topics),
-            'by_subject_area': {},
-            'by_difficulty': {},
-            'by_content_type': {},
-            'average_duration': 0,
-            'most_common_tags': {}
+            'by_subject_area': {k.value: n for k, n in (+self._subject_counts).items()},
+            'by_difficulty': {k.value: n for k, n in (+self._difficulty_counts).items()},
+            'by_content_type': {k.value: n for k, n in (+self._content_type_counts).items()},
+            'average_duration': self._total_duration / len(self.topics) if self.topics else 0,
+            'most_common_tags': dict((+self._tag_counts).most_common(10))
         }
-        
-        total_duration = 0
-        all_tags = []
-        
-        for topic in self.topics.values():
-            # Count by subject area
-            subject = topic.subject_area.value
-            stats['by_subject_area'][subject] = stats['by_subject_area'].get(subject, 0) + 1
-            
-            # Count by difficulty
-            difficulty = topic.difficulty_level.value
-            stats['by_difficulty'][difficulty] = stats['by_difficulty'].get(difficulty, 0) + 1
-            
-            # Count by content type
-            content_type = topic.content_type.value
-            stats['by_content_type'][content_type] = stats['by_content_type'].get(content_type, 0) + 1
-            
-            # Calculate average duration
-            total_duration += topic.estimated_duration
-            
-            # Collect tags
-            all_tags.extend(topic.tags)
-        
-        stats['average_duration'] = total_duration / len(self.topics) if self.topics else 0
-        
-        # Count most common tags
-        tag_counts = {}
-        for tag in all_tags:
-            tag_counts[tag] = tag_counts.get(tag, 0) + 1
-        
-        stats['most_common_tags'] = dict(sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:10])
-        
-        return stats
     
     def export_topics(self, filename: str = None) -> str:
         """Export all topics to a file"""
         if not filename:
             filename = f"topics_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
-        with open(filename, 'w') as f:
-            json.dump({name: self._topic_to_dict(topic) for name, topic in self.topics.items()}, f, indent=2)
+        self._write_json(filename, {name: self._topic_to_dict(topic) for name, topic in self.topics.items()})
         
         print(f"✅ Exported {len(self.topics)} topics to {filename}")
         return filename
@@ -411,17 +594,19 @@ class TopicManager:
     def import_topics(self, filename: str) -> bool:
         """Import topics from a file"""
         try:
-            with open(filename, 'r') as f:
-                data = json.load(f)
+            with open(filename, 'rb') as f:
+                data = orjson.loads(f.read())
             
             imported_count = 0
-            for topic_name, topic_data in data.items():
-                if topic_name not in self.topics:
-                    topic = self._dict_to_topic(topic_data)
-                    self.topics[topic_name] = topic
-                    imported_count += 1
-            
-            self.save_topics()
+            with self._save_lock:
+                for topic_name, topic_data in data.items():
+                    if topic_name not in self.topics:
+                        topic = self._dict_to_topic(topic_data)
+                        self._put_topic(topic_name, topic)
+                        imported_count += 1
+                
+                self._mark_changed()
+                self._schedule_save()
             print(f"✅ Imported {imported_count} new topics from {filename}")
             return True
             
@@ -429,6 +614,15 @@ class TopicManager:
             print(f"❌ Error importing topics: {e}")
             return False
 
+# Managers with possibly unsaved changes; held weakly so short-lived ones can be collected
+_live_managers: "weakref.WeakSet[TopicManager]" = weakref.WeakSet()
+
+@atexit.register
+def _flush_live_managers():
+    """Write pending changes of every manager still alive at exit"""
+    for manager in list(_live_managers):
+        manager.flush()
+
 # Example usage and testing
 if __name__ == "__main__":
     # Create topic manager
@@ -467,8 +661,8 @@ if __name__ == "__main__":
         prerequisites=["basic science", "environmental awareness"],
         estimated_duration=80,
         tags=["environment", "science", "sustainability"],
-        created_date=datetime.now().isoformat(),
-        last_updated=datetime.now().isoformat()
+        created_date=now_iso(),
+        last_updated=now_iso()
     )
     
     manager.add_topic(new_topic)
@@ -0,0 +1,142 @@
+"""
+LLM Response Cache
+Exact-match cache for chat completion requests
+"""
+
+import hashlib
+import json
+import logging
+import math
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+from django.core.cache import caches
+
+logger = logging.getLogger('phoenix.llm_cache')
+
+
+class LLMCache:
+    """
+    Caches chat completion responses keyed by a hash of the request.
+    Stored in the Django cache framework so the backend (local memory,
+    Redis, file) follows the project settings.
+    """
+
+    def __init__(self, alias: str = 'default', ttl: int = 86400, prefix: str = 'llm'):
+        self.alias = alias
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def make_key(self, request: Dict[str, Any]) -> str:
+        """Build a cache key from the request parameters."""
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached response dict, or None on a miss."""
+        try:
+            cached = await self.backend.aget(key)
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            cached = None
+
+        if cached is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cached
+
+    async def set(self, key: str, response: Dict[str, Any]):
+        """Store a response dict."""
+        try:
+            await self.backend.aset(key, response, self.ttl)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache hit statistics."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+
+class SemanticCache:
+    """
+    Near-duplicate response cache.
+    Requests that differ only in the user message are matched by the
+    cosine similarity of the user message embeddings.
+    """
+
+    def __init__(self, client, threshold: float = 0.92, max_entries: int = 1000,
+                 embedding_model: str = "text-embedding-3-small"):
+        self.client = client
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embedding_model = embedding_model
+        self._entries: Dict[str, deque] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _split_request(self, request: Dict[str, Any]) -> Tuple[str, str]:
+        """Split a request into its context key and user message text."""
+        messages = request.get('messages', [])
+        user_text = "\n".join(m['content'] for m in messages if m['role'] == 'user')
+        context = dict(request)
+        context['messages'] = [m for m in messages if m['role'] != 'user']
+        payload = json.dumps(context, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest(), user_text
+
+    async def _embed(self, text: str) -> List[float]:
+        """Embed text as a unit-length vector."""
+        response = await self.client.embeddings.create(model=self.embedding_model, input=text)
+        vector = response.data[0].embedding
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    async def lookup(self, request: Dict[str, Any]) -> Tuple[Optional[List[float]], Optional[Dict[str, Any]]]:
+        """
+        Find a cached response for a similar request.
+
+        Returns:
+            Tuple of (embedding, cached response dict or None)
+        """
+        context_key, user_text = self._split_request(request)
+        try:
+            vector = await self._embed(user_text)
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed: {e}")
+            return None, None
+
+        best_score, best_response = 0.0, None
+        for cached_vector, response in self._entries.get(context_key, ()):
+            score = sum(a * b for a, b in zip(vector, cached_vector))
+            if score > best_score:
+                best_score, best_response = score, response
+
+        if best_score >= self.threshold:
+            self.hits += 1
+            return vector, best_response
+
+        self.misses += 1
+        return vector, None
+
+    def add(self, request: Dict[str, Any], vector: Optional[List[float]], response: Dict[str, Any]):
+        """Store a response under the request's embedding."""
+        if vector is None:
+            return
+        context_key, _ = self._split_request(request)
+        entries = self._entries.setdefault(context_key, deque(maxlen=self.max_entries))
+        entries.append((vector, response))
+
+
+# Global instance
+llm_cache = LLMCache()
@@ -0,0 +1,236 @@
+"""
+Shared async OpenAI client and event loop.
+All LLM calls run on one long-lived loop so the client's pooled
+connections stay bound to it and are reused across requests.
+"""
+
+import asyncio
+import atexit
+import logging
+import random
+import threading
+import weakref
+import httpx
+from typing import Any, Awaitable, Optional
+from django.conf import settings
+from openai import (
+    AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+)
+
+logger = logging.getLogger('phoenix.llm_client')
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and 5xx
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+_shared_client: Optional[AsyncOpenAI] = None
+_client_lock = threading.Lock()
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_request_limiter: Optional['LoopBoundSemaphore'] = None
+
+
+class LoopBoundSemaphore:
+    """
+    Async context manager limiting concurrency like asyncio.Semaphore.
+    asyncio primitives bind to the loop current when they are created,
+    so one semaphore is created lazily for each loop that uses it.
+    """
+
+    def __init__(self, value: int):
+        self.value = value
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.value)
+        return semaphore
+
+    async def acquire(self):
+        await self._semaphore().acquire()
+
+    def release(self):
+        self._semaphore().release()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+class LimitedStream:
+    """
+    Streamed completion that keeps its request limiter slot until the
+    stream is exhausted or closed, since the body is still being read
+    after create() returns. Use it as an async context manager so the
+    slot is also freed when the reader stops early or fails.
+    """
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._iterator = None
+        self._release = release
+
+    @property
+    def response(self):
+        return self._stream.response
+
+    def _release_once(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iterator is None:
+            self._iterator = self._stream.__aiter__()
+        try:
+            return await self._iterator.__anext__()
+        except BaseException:
+            # Exhausted or failed; either way the request is over
+            self._release_once()
+            raise
+
+    async def aclose(self):
+        """Close the underlying response and free the slot."""
+        try:
+            await self._stream.response.aclose()
+        finally:
+            self._release_once()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+def get_shared_client() -> AsyncOpenAI:
+    """Get the process-wide OpenAI client, creating it on first use."""
+    global _shared_client
+    with _client_lock:
+        if _shared_client is None:
+            _shared_client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                max_retries=0,  # Callers apply their own retry policy
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+                    timeout=httpx.Timeout(60.0, connect=5.0)
+                )
+            )
+        return _shared_client
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Get the background event loop, starting its thread on first use."""
+    global _background_loop
+    with _loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_background_loop.run_forever, name='llm-loop', daemon=True
+            ).start()
+        return _background_loop
+
+
+def get_request_limiter() -> LoopBoundSemaphore:
+    """
+    Get the limiter shared by every service for in-flight OpenAI requests.
+    Sized by the OPENAI_MAX_CONCURRENCY setting.
+    """
+    global _request_limiter
+    with _client_lock:
+        if _request_limiter is None:
+            _request_limiter = LoopBoundSemaphore(getattr(settings, 'OPENAI_MAX_CONCURRENCY', 50))
+        return _request_limiter
+
+
+def retry_delay(error: Exception, attempt: int, initial_backoff: float = 1.0,
+                max_backoff: float = 60.0) -> float:
+    """
+    Get the wait before the next attempt, honouring Retry-After when sent.
+    Otherwise backs off exponentially with random jitter.
+    """
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), max_backoff)
+        except ValueError:
+            pass
+
+    backoff = min(initial_backoff * 2 ** (attempt - 1), max_backoff)
+    return random.uniform(backoff / 2, backoff)
+
+
+async def create_chat_completion(client: AsyncOpenAI, max_attempts: int = 6,
+                                 initial_backoff: float = 1.0, max_backoff: float = 60.0,
+                                 **kwargs):
+    """
+    Create a chat completion within the shared request limit, retrying
+    transient failures. The limiter slot is released while waiting.
+    With stream=True a LimitedStream is returned, which holds the slot
+    until it is read to the end or closed.
+    """
+    limiter = get_request_limiter()
+    for attempt in range(1, max_attempts + 1):
+        try:
+            if not kwargs.get('stream'):
+                async with limiter:
+                    return await client.chat.completions.create(**kwargs)
+
+            await limiter.acquire()
+            try:
+                stream = await client.chat.completions.create(**kwargs)
+            except BaseException:
+                limiter.release()
+                raise
+            return LimitedStream(stream, limiter.release)
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_attempts:
+                raise
+            delay = retry_delay(e, attempt, initial_backoff, max_backoff)
+            logger.warning(f"OpenAI request failed ({type(e).__name__}), "
+                           f"retry {attempt}/{max_attempts - 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def run_sync(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the background loop and wait for its result.
+    Must not be called from a coroutine running on that loop.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_background_loop()).result(timeout)
+
+
+def shutdown(timeout: float = 5.0):
+    """
+    Close the shared client and stop the background loop.
+    Registered with atexit so the pooled connections held by the
+    shared services are closed when Django shuts down; safe to call
+    more than once.
+    """
+    global _background_loop, _shared_client
+    with _loop_lock:
+        loop, _background_loop = _background_loop, None
+    with _client_lock:
+        client, _shared_client = _shared_client, None
+
+    try:
+        if client is not None:
+            if loop is not None:
+                asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout)
+            else:
+                asyncio.run(client.close())
+    except Exception as e:
+        logger.warning(f"Error closing OpenAI client: {e}")
+    finally:
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+
+
+atexit.register(shutdown)
@@ -3,15 +3,47 @@ Simplified Orchestrator AI service for generating structured learning plans.
 Focuses on core functionality without complex model routing.
 """
 
-import json
+import asyncio
+import hashlib
+import ijson
 import logging
-from typing import Dict, Any, List
+from functools import lru_cache
+from typing import Dict, Any, List, Callable, Optional, Tuple
 from django.conf import settings
-from services.local_llm import get_llm_service
+from core.llm_client import create_chat_completion, get_shared_client, run_sync
+from core.llm_cache import LLMCache
+from core.worker.service import get_worker_service, store_knowledge_components, store_comprehension_check
+from core.quality_control.service import get_qc_service, validate_learning_objective
 from database.models import LearningObjective, KnowledgeComponent, ComprehensionCheck, GenerationLog
 
 logger = logging.getLogger('phoenix.orchestrator')
 
+# Plans for the same topic are reused for a week
+PLAN_CACHE_TTL = 7 * 86400
+
+LEARNING_PLAN_PROMPT_TEMPLATE = """Create a learning plan for "{topic}" in this exact JSON format:
+
+{{
+  "learning_objective": {{
+    "title": "Clear, concise title",
+    "core_question": "What is the main question this addresses?",
+    "summary": "Brief 2-3 sentence summary"
+  }},
+  "knowledge_components_plan": [
+    {{"type": "CORE_CONCEPT", "purpose": "Define the main concept", "sort_order": 1}},
+    {{"type": "FACT", "purpose": "Key fact about the topic", "sort_order": 2}},
+    {{"type": "EXAMPLE", "purpose": "Practical example", "sort_order": 3}},
+    {{"type": "PRINCIPLE", "purpose": "Underlying principle", "sort_order": 4}},
+    {{"type": "WARNING", "purpose": "Common misconception to avoid", "sort_order": 5}}
+  ],
+  "comprehension_check_plan": {{
+    "question_type": "multiple_choice",
+    "purpose": "Test understanding of key concepts"
+  }}
+}}
+
+Keep responses concise but educational. Focus on the most important aspects of {topic}."""
+
 
 class SimplifiedOrchestratorService:
     """
@@ -19,37 +51,75 @@ class SimplifiedOrchestratorService:
     Uses single model with optimized prompts for cost efficiency.
     """
     
-    def __init__(self):
-        self.client = get_llm_service('orchestrator')
+    def __init__(self, cache: Optional[LLMCache] = None):
+        self.client = get_shared_client()
         self.model = "gpt-3.5-turbo"  # Cost-effective model for MVP
+        self.cache = cache or LLMCache(ttl=PLAN_CACHE_TTL, prefix='plan')
     
     def generate_learning_plan(self, topic: str) -> Dict[str, Any]:
         """
         Generate a structured learning plan for a given topic.
-        Optimized for cost and simplicity.
+        Synchronous wrapper around agenerate_learning_plan.
+        """
+        return run_sync(self.agenerate_learning_plan(topic))
+    
+    async def agenerate_learning_plan(self, topic: str,
+                                      on_component: Optional[Callable[[Dict[str, Any], Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+        """
+        Generate a structured learning plan for a given topic.
+        The response is streamed and parsed as it arrives; on_component is
+        called with each component plan, and the learning objective parsed
+        so far, as soon as the component is complete, so work on early
+        components can start before the plan has finished.
+        Plans are cached per topic, ignoring case and surrounding spaces.
         """
+        key = self._cache_key(topic)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            logger.info(f"Using cached learning plan for topic: {topic}")
+            if on_component:
+                for component_plan in cached.get('knowledge_components_plan', []):
+                    on_component(component_plan, cached.get('learning_objective', {}))
+            return cached
+        
         try:
             prompt = self._create_optimized_prompt(topic)
             
             logger.info(f"Generating learning plan for topic: {topic}")
             
-            response = self.client.chat.completions.create(
+            stream = await create_chat_completion(
+                self.client,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are an expert educational architect. Create comprehensive learning plans in valid JSON format."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                max_tokens=1500  # Reduced for cost efficiency
+                max_tokens=1500,  # Reduced for cost efficiency
+                response_format={"type": "json_object"},
+                stream=True
             )
             
-            # Parse the JSON response
-            plan_data = json.loads(response.choices[0].message.content)
+            # Parse the JSON response incrementally as deltas arrive
+            builder = ijson.ObjectBuilder()
+            events = ijson.sendable_list()
+            parser = ijson.parse_coro(events)
+            async with stream:
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parser.send(delta.encode('utf-8'))
+                        self._build_plan(builder, events, on_component)
+            parser.close()
+            self._build_plan(builder, events, on_component)
+            
+            plan_data = builder.value
+            await self.cache.set(key, plan_data)
             
             logger.info(f"Successfully generated learning plan for topic: {topic}")
             return plan_data
             
-        except json.JSONDecodeError as e:
+        except ijson.JSONError as e:
             logger.error(f"Failed to parse JSON response for topic {topic}: {e}")
             raise ValueError(f"Invalid JSON response from AI: {e}")
             
@@ -57,33 +127,73 @@ class SimplifiedOrchestratorService:
             logger.error(f"Error generating learning plan for topic {topic}: {e}")
             raise
     
+    def _cache_key(self, topic: str) -> str:
+        """Build the plan cache key for a topic."""
+        digest = hashlib.sha256(topic.strip().lower().encode('utf-8')).hexdigest()
+        return f"{self.cache.prefix}:{digest}"
+    
+    def _build_plan(self, builder, events: List[tuple],
+                    on_component: Optional[Callable[[Dict[str, Any], Dict[str, Any]], Any]]):
+        """Apply parsed events to the plan, reporting each completed component."""
+        for prefix, event, value in events:
+            builder.event(event, value)
+            if on_component and prefix == 'knowledge_components_plan.item' and event == 'end_map':
+                on_component(builder.value['knowledge_components_plan'][-1],
+                             builder.value.get('learning_objective', {}))
+        del events[:]
+    
+    async def agenerate_content(self, topic: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Generate and validate a topic's content as one pipeline.
+        Each component is generated as soon as its plan arrives in the
+        orchestrator stream and validated as soon as it is generated, so the
+        stages overlap instead of running one after another. Validation
+        results land in the validation cache for validate_learning_objective.
+        
+        Returns:
+            Tuple of (plan data, component results in plan order, quiz result)
+        """
+        worker = get_worker_service()
+        qc = get_qc_service()
+        component_tasks = []
+        
+        async def generate_component(component_plan: Dict[str, Any], title: str) -> Dict[str, Any]:
+            result = await worker.agenerate_knowledge_component(
+                title, component_plan['type'], component_plan['purpose'], component_plan['sort_order']
+            )
+            if result['success']:
+                await qc.avalidate_content(result['content'], component_plan['type'], title)
+            return result
+        
+        async def generate_check(check_plan: Dict[str, Any], title: str) -> Dict[str, Any]:
+            result = await worker.agenerate_comprehension_check(title, check_plan['purpose'])
+            if result['success']:
+                await qc.avalidate_content(result['quiz_data']['question_text'], 'comprehension_check', title)
+            return result
+        
+        def on_component(component_plan: Dict[str, Any], learning_objective: Dict[str, Any]):
+            title = learning_objective.get('title') or topic
+            component_tasks.append(asyncio.ensure_future(generate_component(component_plan, title)))
+        
+        try:
+            plan_data = await self.agenerate_learning_plan(topic, on_component)
+            check_result, *component_results = await asyncio.gather(
+                generate_check(plan_data['comprehension_check_plan'], plan_data['learning_objective']['title']),
+                *component_tasks
+            )
+        except BaseException:
+            for task in component_tasks:
+                task.cancel()
+            raise
+        
+        return plan_data, component_results, check_result
+    
     def _create_optimized_prompt(self, topic: str) -> str:
         """
         Create an optimized prompt that generates the required JSON structure
         while minimizing token usage.
         """
-        return f"""Create a learning plan for "{topic}" in this exact JSON format:
-
-{{
-  "learning_objective": {{
-    "title": "Clear, concise title",
-    "core_question": "What is the main question this addresses?",
-    "summary": "Brief 2-3 sentence summary"
-  }},
-  "knowledge_components_plan": [
-    {{"type": "CORE_CONCEPT", "purpose": "Define the main concept", "sort_order": 1}},
-    {{"type": "FACT", "purpose": "Key fact about the topic", "sort_order": 2}},
-    {{"type": "EXAMPLE", "purpose": "Practical example", "sort_order": 3}},
-    {{"type": "PRINCIPLE", "purpose": "Underlying principle", "sort_order": 4}},
-    {{"type": "WARNING", "purpose": "Common misconception to avoid", "sort_order": 5}}
-  ],
-  "comprehension_check_plan": {{
-    "question_type": "multiple_choice",
-    "purpose": "Test understanding of key concepts"
-  }}
-}}
-
-Keep responses concise but educational. Focus on the most important aspects of {topic}."""
+        return LEARNING_PLAN_PROMPT_TEMPLATE.format(topic=topic)
     
     def create_learning_objective(self, plan_data: Dict[str, Any]) -> LearningObjective:
         """Create a LearningObjective from the plan data."""
@@ -129,12 +239,18 @@ Keep responses concise but educational. Focus on the most important aspects of {
         return comprehension_check_plan
 
 
+@lru_cache(maxsize=1)
+def get_orchestrator_service() -> SimplifiedOrchestratorService:
+    """Get the shared orchestrator service."""
+    return SimplifiedOrchestratorService()
+
+
 def orchestrate_content_generation(topic: str) -> Dict[str, Any]:
     """
     Main function to orchestrate content generation for a topic.
     Simplified version for MVP.
     """
-    service = SimplifiedOrchestratorService()
+    service = get_orchestrator_service()
     
     try:
         # Generate the learning plan
@@ -162,3 +278,39 @@ def orchestrate_content_generation(topic: str) -> Dict[str, Any]:
             'status': 'error',
             'error': str(e)
         }
+
+
+def generate_validated_content(topic: str) -> Dict[str, Any]:
+    """
+    Plan, generate and validate all content for a topic in one pass.
+    The LLM stages run as an overlapping pipeline; database writes
+    happen afterwards on the calling thread.
+    """
+    service = get_orchestrator_service()
+    
+    try:
+        plan_data, component_results, check_result = run_sync(service.agenerate_content(topic))
+        
+        learning_objective = service.create_learning_objective(plan_data)
+        knowledge_components = store_knowledge_components(
+            learning_objective, plan_data['knowledge_components_plan'], component_results
+        )
+        comprehension_check = store_comprehension_check(learning_objective, check_result['quiz_data'])
+        
+        # Answered from the validation cache filled by the pipeline
+        validation_results = validate_learning_objective(learning_objective)
+        
+        return {
+            'learning_objective': learning_objective,
+            'knowledge_components': knowledge_components,
+            'comprehension_check': comprehension_check,
+            'validation_results': validation_results,
+            'status': 'success'
+        }
+        
+    except Exception as e:
+        logger.error(f"Content pipeline failed for topic {topic}: {e}")
+        return {
+            'status': 'error',
+            'error': str(e)
+        }
@@ -3,11 +3,42 @@ Simplified Quality Control service for validating AI-generated content.
 Uses single model with optimized prompts for cost efficiency.
 """
 
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, List
+import orjson
+import re
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from django.conf import settings
-from services.local_llm import get_llm_service
-from database.models import ValidationLog
+from core.llm_client import LoopBoundSemaphore, create_chat_completion, get_shared_client, run_sync
+from core.llm_cache import LLMCache
+from database.models import KnowledgeComponent, ComprehensionCheck, ValidationLog
+from core.quality_control.validation_log_sink import validation_log_sink
+
+VALIDATION_FIELDS = ['validation_status', 'validation_notes']
+
+# A verdict is one word plus at most a one-sentence reason
+VERDICT_MAX_TOKENS = 40
+
+# Matches replies opening with VALID, allowing leading whitespace and quotes
+_VALID_RE = re.compile(r'^\s*["\']?valid\b', re.IGNORECASE)
+
+VALIDATION_PROMPT_TEMPLATE = """Validate this {content_type} content about "{topic}":
+
+Content: "{content}"
+
+Check for:
+1. Accuracy - Is the information correct?
+2. Clarity - Is it clear and understandable?
+3. Appropriateness - Is it suitable for educational use?
+4. Completeness - Does it fully address the topic?
+
+Respond with:
+- "VALID" if the content passes all checks
+- "INVALID: [reason]" if there are issues
+
+Start your reply with VALID or INVALID and keep any reason to one short sentence."""
 
 logger = logging.getLogger('phoenix.quality_control')
 
@@ -18,42 +49,63 @@ class SimplifiedQualityControlService:
     Uses single model with different validation prompts.
     """
     
-    def __init__(self):
-        self.client = get_llm_service('quality_control')
+    def __init__(self, max_concurrency: int = 10, cache: Optional[LLMCache] = None):
+        self.client = get_shared_client()
         self.model = "gpt-3.5-turbo"  # Cost-effective model for MVP
+        # Caps concurrent validation requests to stay under the rate limit
+        self._sem = LoopBoundSemaphore(max_concurrency)
+        # Identical content is only validated once per day
+        self.cache = cache or LLMCache(prefix='validation')
     
     def validate_content(self, content: str, content_type: str, topic: str) -> Dict[str, Any]:
         """
         Validate content using AI-powered quality control.
-        Optimized for cost and accuracy.
+        Synchronous wrapper around avalidate_content.
+        """
+        return run_sync(self.avalidate_content(content, content_type, topic))
+    
+    async def avalidate_content(self, content: str, content_type: str, topic: str) -> Dict[str, Any]:
+        """
+        Validate content using AI-powered quality control.
+        Results for identical content are served from the cache.
         """
+        key = self._cache_key(content, content_type, topic)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+        
         try:
             prompt = self._create_validation_prompt(content, content_type, topic)
             
             logger.info(f"Validating {content_type} content for topic: {topic}")
             
-            response = self.client.chat.completions.create(
+            stream = await create_chat_completion(
+                self.client,
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are a quality control expert. Validate educational content for accuracy, clarity, and appropriateness."},
+                    {"role": "system", "content": "You are a quality control expert. Validate educational content for accuracy, clarity, and appropriateness. Your reply must start with VALID or INVALID."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,  # Lower temperature for consistent validation
-                max_tokens=200  # Reduced for cost efficiency
+                max_tokens=VERDICT_MAX_TOKENS,
+                stream=True
             )
             
-            validation_result = response.choices[0].message.content.strip()
+            async with stream:
+                validation_result = (await self._read_verdict(stream)).strip()
             
             # Parse validation result
             is_valid = self._parse_validation_result(validation_result)
             
             logger.info(f"Validation result for {content_type}: {'PASSED' if is_valid else 'FAILED'}")
             
-            return {
+            result = {
                 'is_valid': is_valid,
                 'validation_notes': validation_result,
                 'success': True
             }
+            await self.cache.set(key, result)
+            return result
             
         except Exception as e:
             logger.error(f"Error validating {content_type} content: {e}")
@@ -63,25 +115,134 @@ class SimplifiedQualityControlService:
                 'success': False
             }
     
-    def validate_knowledge_component(self, component) -> bool:
+    async def _read_verdict(self, stream) -> str:
+        """
+        Read a streamed validation reply.
+        A VALID verdict needs no reason, so the stream is closed as soon
+        as it is seen; INVALID replies are read in full for the reason.
+        """
+        reply = ""
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            reply += delta
+            # Wait for the character after the first word so "VALID" is complete
+            if len(reply.lstrip(' \n"\'')) > len('VALID') and _VALID_RE.match(reply):
+                await stream.aclose()
+                return 'VALID'
+        return reply
+    
+    async def avalidate_contents(self, items: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+        """
+        Validate several (content, content_type, topic) items concurrently.
+        Results are returned in input order.
+        """
+        async def validate(content: str, content_type: str, topic: str) -> Dict[str, Any]:
+            async with self._sem:
+                return await self.avalidate_content(content, content_type, topic)
+        
+        return await asyncio.gather(*[validate(*item) for item in items])
+    
+    def validate_many(self, items: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+        """
+        Validate several (content, content_type, topic) items with one LLM call.
+        Synchronous wrapper around avalidate_many.
+        """
+        return run_sync(self.avalidate_many(items))
+    
+    async def avalidate_many(self, items: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+        """
+        Validate several (content, content_type, topic) items with one LLM call.
+        Cached items are skipped. Verdicts are matched by id; if the reply
+        does not cover exactly the ids sent, every pending item is validated
+        individually. Results are returned in input order.
+        """
+        keys = [self._cache_key(*item) for item in items]
+        cached = await asyncio.gather(*[self.cache.get(key) for key in keys])
+        results = dict(enumerate(cached))
+        pending = [i for i, result in results.items() if result is None]
+        
+        if pending:
+            sections = [
+                f"{n}. [{items[i][1]} about \"{items[i][2]}\"] \"{items[i][0]}\""
+                for n, i in enumerate(pending, 1)
+            ]
+            prompt = (
+                "Validate each numbered piece of educational content below for accuracy, "
+                "clarity, appropriateness and completeness.\n\n"
+                + "\n".join(sections)
+                + '\n\nReturn a JSON object of the form '
+                '{"results": [{"id": 1, "verdict": "VALID"}, {"id": 2, "verdict": "INVALID: [one-sentence reason]"}, ...]} '
+                "with one entry per numbered item, using the item's number as its id."
+            )
+            
+            try:
+                logger.info(f"Validating {len(pending)} items in one call")
+                
+                response = await create_chat_completion(
+                    self.client,
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": "You are a quality control expert. Validate educational content for accuracy, clarity, and appropriateness. Reply in JSON."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.3,  # Lower temperature for consistent validation
+                    max_tokens=VERDICT_MAX_TOKENS * len(pending) + 20,  # Room for the JSON wrapper
+                    response_format={"type": "json_object"}
+                )
+                
+                entries = orjson.loads(response.choices[0].message.content).get('results', [])
+                verdicts = {}
+                for entry in entries:
+                    verdict = entry.get('verdict')
+                    if isinstance(verdict, str) and verdict.strip():
+                        verdicts[int(entry['id'])] = verdict.strip()
+                
+                # Only trust the batch if it covers exactly the items sent; a partial or
+                # renumbered reply could pin a verdict on the wrong item
+                if len(entries) == len(pending) and set(verdicts) == set(range(1, len(pending) + 1)):
+                    for n, i in enumerate(pending, 1):
+                        results[i] = {
+                            'is_valid': self._parse_validation_result(verdicts[n]),
+                            'validation_notes': verdicts[n],
+                            'success': True
+                        }
+                        await self.cache.set(keys[i], results[i])
+                else:
+                    logger.warning(f"Batched validation returned ids {sorted(verdicts)} for {len(pending)} items")
+            except Exception as e:
+                logger.error(f"Error validating items in one call: {e}")
+        
+        missing = [i for i, result in results.items() if result is None]
+        if missing:
+            logger.warning(f"{len(missing)} items not covered by batched validation, validating individually")
+            fallback = await self.avalidate_contents([items[i] for i in missing])
+            results.update(zip(missing, fallback))
+        
+        return [results[i] for i in range(len(items))]
+    
+    def validate_knowledge_component(self, component, topic: Optional[str] = None) -> bool:
         """
         Validate a knowledge component.
+        Pass the learning objective title as topic to avoid fetching it.
         Returns True if valid, False otherwise.
         """
         result = self.validate_content(
             component.content,
             component.type,
-            component.learning_objective.title
+            topic or component.learning_objective.title
         )
-        
+        return self.record_component_validation(component, result)
+    
+    def record_component_validation(self, component, result: Dict[str, Any]) -> bool:
+        """
+        Store a validation result on a knowledge component.
+        Returns True if valid, False otherwise.
+        """
         # Update component status
-        if result['is_valid']:
-            component.validation_status = 'APPROVED'
-        else:
-            component.validation_status = 'FLAGGED'
-        
-        component.validation_notes = result['validation_notes']
-        component.save()
+        self._apply_validation(component, result)
+        component.save(update_fields=VALIDATION_FIELDS)
         
         # Log validation
         self._log_validation(component.id, 'knowledge_component', 'ai_validation', 
@@ -89,25 +250,27 @@ class SimplifiedQualityControlService:
         
         return result['is_valid']
     
-    def validate_comprehension_check(self, check) -> bool:
+    def validate_comprehension_check(self, check, topic: Optional[str] = None) -> bool:
         """
         Validate a comprehension check.
+        Pass the learning objective title as topic to avoid fetching it.
         Returns True if valid, False otherwise.
         """
         result = self.validate_content(
             check.question_text,
             'comprehension_check',
-            check.learning_objective.title
+            topic or check.learning_objective.title
         )
-        
+        return self.record_check_validation(check, result)
+    
+    def record_check_validation(self, check, result: Dict[str, Any]) -> bool:
+        """
+        Store a validation result on a comprehension check.
+        Returns True if valid, False otherwise.
+        """
         # Update check status
-        if result['is_valid']:
-            check.validation_status = 'APPROVED'
-        else:
-            check.validation_status = 'FLAGGED'
-        
-        check.validation_notes = result['validation_notes']
-        check.save()
+        self._apply_validation(check, result)
+        check.save(update_fields=VALIDATION_FIELDS)
         
         # Log validation
         self._log_validation(check.id, 'comprehension_check', 'ai_validation',
@@ -115,50 +278,56 @@ class SimplifiedQualityControlService:
         
         return result['is_valid']
     
+    def _cache_key(self, content: str, content_type: str, topic: str) -> str:
+        """Build the validation cache key for a piece of content."""
+        digest = hashlib.sha256(f"{content_type}|{topic}|{content}".encode('utf-8')).hexdigest()
+        return f"{self.cache.prefix}:{digest}"
+    
     def _create_validation_prompt(self, content: str, content_type: str, topic: str) -> str:
         """Create an optimized validation prompt."""
-        return f"""Validate this {content_type} content about "{topic}":
-
-Content: "{content}"
-
-Check for:
-1. Accuracy - Is the information correct?
-2. Clarity - Is it clear and understandable?
-3. Appropriateness - Is it suitable for educational use?
-4. Completeness - Does it fully address the topic?
-
-Respond with:
-- "VALID" if the content passes all checks
-- "INVALID: [reason]" if there are issues
-
-Keep your response concise and specific."""
+        return VALIDATION_PROMPT_TEMPLATE.format(content=content, content_type=content_type, topic=topic)
     
     def _parse_validation_result(self, result: str) -> bool:
         """Parse the validation result to determine if content is valid."""
-        result_lower = result.lower().strip()
-        return result_lower.startswith('valid')
+        return bool(_VALID_RE.match(result))
+    
+    def _apply_validation(self, obj, result: Dict[str, Any]) -> bool:
+        """Set the validation fields of a component or check without saving it."""
+        obj.validation_status = 'APPROVED' if result['is_valid'] else 'FLAGGED'
+        obj.validation_notes = result['validation_notes']
+        return result['is_valid']
     
     def _log_validation(self, content_id: str, content_type: str, validation_type: str, 
                        status: str, details: Dict[str, Any]):
         """Log validation attempt."""
+        self._save_validation_logs([ValidationLog(
+            content_id=content_id,
+            content_type=content_type,
+            validation_type=validation_type,
+            status=status,
+            details=details
+        )])
+    
+    def _save_validation_logs(self, logs: List[ValidationLog]):
+        """Queue validation logs for a batched insert once the transaction commits."""
         try:
-            ValidationLog.objects.create(
-                content_id=content_id,
-                content_type=content_type,
-                validation_type=validation_type,
-                status=status,
-                details=details
-            )
+            validation_log_sink.put_many(logs)
         except Exception as e:
             logger.error(f"Failed to log validation: {e}")
 
 
+@lru_cache(maxsize=1)
+def get_qc_service() -> SimplifiedQualityControlService:
+    """Get the shared quality control service."""
+    return SimplifiedQualityControlService()
+
+
 def validate_learning_objective(learning_objective) -> Dict[str, Any]:
     """
     Validate all components of a learning objective.
     Simplified version for MVP.
     """
-    service = SimplifiedQualityControlService()
+    service = get_qc_service()
     
     validation_results = {
         'learning_objective_id': str(learning_objective.id),
@@ -171,21 +340,47 @@ def validate_learning_objective(learning_objective) -> Dict[str, Any]:
         'overall_status': 'PENDING'
     }
     
-    # Validate knowledge components
-    for component in learning_objective.knowledge_components.all():
+    # Only the fields needed for validation are loaded; the title is
+    # taken from learning_objective, so no per-row foreign key fetch
+    components = list(learning_objective.knowledge_components.only('id', 'learning_objective', 'type', 'content'))
+    checks = list(learning_objective.comprehension_checks.only('id', 'learning_objective', 'question_text'))
+    
+    # Validate every component and check with a single call
+    items = [(component.content, component.type, learning_objective.title) for component in components]
+    items += [(check.question_text, 'comprehension_check', learning_objective.title) for check in checks]
+    results = service.validate_many(items)
+    component_results, check_results = results[:len(components)], results[len(components):]
+    
+    logs = []
+    
+    # Record knowledge component results
+    for component, result in zip(components, component_results):
         validation_results['components_validated'] += 1
-        if service.validate_knowledge_component(component):
+        if service._apply_validation(component, result):
             validation_results['components_passed'] += 1
         else:
             validation_results['components_failed'] += 1
+        logs.append(ValidationLog(
+            content_id=component.id, content_type='knowledge_component', validation_type='ai_validation',
+            status='PASSED' if result['is_valid'] else 'FAILED', details=result
+        ))
     
-    # Validate comprehension checks
-    for check in learning_objective.comprehension_checks.all():
+    # Record comprehension check results
+    for check, result in zip(checks, check_results):
         validation_results['checks_validated'] += 1
-        if service.validate_comprehension_check(check):
+        if service._apply_validation(check, result):
             validation_results['checks_passed'] += 1
         else:
             validation_results['checks_failed'] += 1
+        logs.append(ValidationLog(
+            content_id=check.id, content_type='comprehension_check', validation_type='ai_validation',
+            status='PASSED' if result['is_valid'] else 'FAILED', details=result
+        ))
+    
+    # Write every status change in one statement per table; logs are inserted in the background
+    KnowledgeComponent.objects.bulk_update(components, VALIDATION_FIELDS, batch_size=500)
+    ComprehensionCheck.objects.bulk_update(checks, VALIDATION_FIELDS, batch_size=500)
+    service._save_validation_logs(logs)
     
     # Determine overall status
     total_components = validation_results['components_validated']
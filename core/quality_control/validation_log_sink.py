@@ -0,0 +1,23 @@
+"""
+Validation log sink for batching ValidationLog inserts off the hot path.
+"""
+
+import atexit
+from services.generation_log_sink import GenerationLogSink
+from database.models import ValidationLog
+
+
+class ValidationLogSink(GenerationLogSink):
+    """
+    Buffers ValidationLog rows in a bounded queue and bulk-inserts them
+    from a background daemon thread.
+    Rows are only queued once the validated content has been committed.
+    """
+
+    model = ValidationLog
+    thread_name = 'validation-log-sink'
+
+
+# Global instance
+validation_log_sink = ValidationLogSink(batch_size=1000)
+atexit.register(validation_log_sink.flush)
@@ -3,14 +3,41 @@ Simplified Worker AI service for generating specific content components.
 Uses single model with optimized prompts for cost efficiency.
 """
 
+import asyncio
 import logging
-from typing import Dict, Any
+import orjson
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Any, List
 from django.conf import settings
-from services.local_llm import get_llm_service
+from django.db import transaction
+from core.llm_client import create_chat_completion, get_shared_client, run_sync
 from database.models import KnowledgeComponent, ComprehensionCheck, GenerationLog
 
 logger = logging.getLogger('phoenix.worker')
 
+COMPONENT_PROMPT_TEMPLATES = {
+    'CORE_CONCEPT': "Explain the core concept of {title}. {purpose}. Keep it clear and educational (2-3 sentences).",
+    'FACT': "State an important fact about {title}. {purpose}. Be concise and accurate (1-2 sentences).",
+    'EXAMPLE': "Provide a clear, practical example of {title}. {purpose}. Make it easy to understand (2-3 sentences).",
+    'PRINCIPLE': "Explain the key principle behind {title}. {purpose}. Focus on the underlying concept (2-3 sentences).",
+    'ANALOGY': "Create a helpful analogy for {title}. {purpose}. Make it relatable and clear (2-3 sentences).",
+    'WARNING': "Identify a common misconception or warning about {title}. {purpose}. Be helpful and clear (1-2 sentences)."
+}
+DEFAULT_COMPONENT_PROMPT_TEMPLATE = "Create {component_type} content about {title}. {purpose}."
+
+QUIZ_PROMPT_TEMPLATE = """Create a multiple-choice quiz question about {title}. {purpose}.
+
+Return your response in this exact JSON format:
+{{
+  "question_text": "Clear, specific question about {title}",
+  "options": ["Option A", "Option B", "Option C", "Option D"],
+  "correct_index": 0,
+  "explanation": "Brief explanation of why the correct answer is right"
+}}
+
+Make the question challenging but fair, and ensure all options are plausible."""
+
 
 class SimplifiedWorkerService:
     """
@@ -19,7 +46,7 @@ class SimplifiedWorkerService:
     """
     
     def __init__(self):
-        self.client = get_llm_service('worker')
+        self.client = get_shared_client()
         self.model = "gpt-3.5-turbo"  # Cost-effective model for MVP
     
     def generate_knowledge_component(self, 
@@ -29,6 +56,19 @@ class SimplifiedWorkerService:
                                    sort_order: int) -> Dict[str, Any]:
         """
         Generate a specific knowledge component.
+        Synchronous wrapper around agenerate_knowledge_component.
+        """
+        return run_sync(self.agenerate_knowledge_component(
+            learning_objective_title, component_type, purpose, sort_order
+        ))
+    
+    async def agenerate_knowledge_component(self, 
+                                          learning_objective_title: str,
+                                          component_type: str,
+                                          purpose: str,
+                                          sort_order: int) -> Dict[str, Any]:
+        """
+        Generate a specific knowledge component.
         Optimized for cost and quality.
         """
         try:
@@ -36,7 +76,8 @@ class SimplifiedWorkerService:
             
             logger.info(f"Generating {component_type} component for: {learning_objective_title}")
             
-            response = self.client.chat.completions.create(
+            response = await create_chat_completion(
+                self.client,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": f"You are an expert educator creating {component_type.lower()} content."},
@@ -61,11 +102,125 @@ class SimplifiedWorkerService:
                 'success': False
             }
     
+    async def agenerate_knowledge_components(self,
+                                           learning_objective_title: str,
+                                           components_plan: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Generate every planned knowledge component concurrently.
+        Results are returned in plan order.
+        """
+        return await asyncio.gather(*[
+            self.agenerate_knowledge_component(
+                learning_objective_title,
+                component_plan['type'],
+                component_plan['purpose'],
+                component_plan['sort_order']
+            )
+            for component_plan in components_plan
+        ])
+    
+    async def agenerate_all_components(self,
+                                     learning_objective_title: str,
+                                     components_plan: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Generate every planned knowledge component with a single LLM call.
+        Reply items are matched on sort_order, or by position when the
+        sort orders don't line up but the counts do. Components missing from
+        the reply are generated individually. Results are returned in plan order.
+        """
+        sections = [
+            f"{component_plan['sort_order']}. {component_plan['type']}: "
+            + self._create_component_prompt(learning_objective_title, component_plan['type'], component_plan['purpose'])
+            for component_plan in components_plan
+        ]
+        prompt = (
+            f"Write the following knowledge components about {learning_objective_title}.\n\n"
+            + "\n".join(sections)
+            + '\n\nReturn a JSON object of the form {"components": [{"sort_order": 1, "content": "..."}]} '
+            "with one entry per numbered item."
+        )
+        
+        results = {}
+        try:
+            logger.info(f"Generating {len(components_plan)} components in one call for: {learning_objective_title}")
+            
+            response = await create_chat_completion(
+                self.client,
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "You are an expert educator creating educational content. Reply in JSON."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=250 * len(components_plan),
+                response_format={"type": "json_object"}
+            )
+            
+            items = orjson.loads(response.choices[0].message.content).get('components', [])
+            results = self._match_components(components_plan, items)
+        except Exception as e:
+            logger.error(f"Error generating components in one call: {e}")
+        
+        missing = [i for i in range(len(components_plan)) if i not in results]
+        if missing:
+            logger.warning(f"{len(missing)} components missing from batched reply, generating individually")
+            fallback = await self.agenerate_knowledge_components(
+                learning_objective_title, [components_plan[i] for i in missing]
+            )
+            results.update(zip(missing, fallback))
+        
+        return [results[i] for i in range(len(components_plan))]
+    
+    @staticmethod
+    def _match_components(components_plan: List[Dict[str, Any]],
+                          items: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """
+        Map batched reply items to plan positions.
+        Returns {plan index: result} for every item that could be placed.
+        """
+        def order_of(value):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+        
+        plan_orders = [order_of(plan['sort_order']) for plan in components_plan]
+        item_orders = [order_of(item.get('sort_order')) for item in items]
+        
+        # Models echo sort_order as "2" or 2.0 as often as 2, and sometimes repeat or renumber it
+        if len(set(item_orders)) == len(items) and set(item_orders) == set(plan_orders):
+            positions = {order: i for i, order in enumerate(plan_orders)}
+            placed = [(positions[order], item) for order, item in zip(item_orders, items)]
+        elif len(items) == len(components_plan):
+            placed = list(enumerate(items))
+        else:
+            counts = Counter(item_orders)
+            positions = {order: i for i, order in enumerate(plan_orders)}
+            placed = [
+                (positions[order], item) for order, item in zip(item_orders, items)
+                if counts[order] == 1 and order in positions
+            ]
+        
+        return {
+            i: {'content': item['content'].strip(), 'success': True}
+            for i, item in placed
+            if isinstance(item.get('content'), str) and item['content'].strip()
+        }
+    
     def generate_comprehension_check(self, 
                                    learning_objective_title: str,
                                    purpose: str) -> Dict[str, Any]:
         """
         Generate a comprehension check (quiz question).
+        Synchronous wrapper around agenerate_comprehension_check.
+        """
+        return run_sync(self.agenerate_comprehension_check(learning_objective_title, purpose))
+    
+    async def agenerate_comprehension_check(self, 
+                                          learning_objective_title: str,
+                                          purpose: str) -> Dict[str, Any]:
+        """
+        Generate a comprehension check (quiz question).
         Optimized for cost and quality.
         """
         try:
@@ -73,19 +228,20 @@ class SimplifiedWorkerService:
             
             logger.info(f"Generating comprehension check for: {learning_objective_title}")
             
-            response = self.client.chat.completions.create(
+            response = await create_chat_completion(
+                self.client,
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are an expert assessment designer creating educational quiz questions."},
+                    {"role": "system", "content": "You are an expert assessment designer creating educational quiz questions. Reply in JSON."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                max_tokens=400  # Slightly more for quiz questions
+                max_tokens=400,  # Slightly more for quiz questions
+                response_format={"type": "json_object"}
             )
             
-            # Parse the JSON response
-            import json
-            quiz_data = json.loads(response.choices[0].message.content)
+            # JSON mode guarantees the reply is a single JSON object
+            quiz_data = orjson.loads(response.choices[0].message.content)
             
             logger.info(f"Successfully generated comprehension check")
             return {
@@ -107,30 +263,12 @@ class SimplifiedWorkerService:
     
     def _create_component_prompt(self, title: str, component_type: str, purpose: str) -> str:
         """Create an optimized prompt for knowledge components."""
-        prompts = {
-            'CORE_CONCEPT': f"Explain the core concept of {title}. {purpose}. Keep it clear and educational (2-3 sentences).",
-            'FACT': f"State an important fact about {title}. {purpose}. Be concise and accurate (1-2 sentences).",
-            'EXAMPLE': f"Provide a clear, practical example of {title}. {purpose}. Make it easy to understand (2-3 sentences).",
-            'PRINCIPLE': f"Explain the key principle behind {title}. {purpose}. Focus on the underlying concept (2-3 sentences).",
-            'ANALOGY': f"Create a helpful analogy for {title}. {purpose}. Make it relatable and clear (2-3 sentences).",
-            'WARNING': f"Identify a common misconception or warning about {title}. {purpose}. Be helpful and clear (1-2 sentences)."
-        }
-        
-        return prompts.get(component_type, f"Create {component_type.lower()} content about {title}. {purpose}.")
+        template = COMPONENT_PROMPT_TEMPLATES.get(component_type, DEFAULT_COMPONENT_PROMPT_TEMPLATE)
+        return template.format(title=title, purpose=purpose, component_type=component_type.lower())
     
     def _create_quiz_prompt(self, title: str, purpose: str) -> str:
         """Create an optimized prompt for quiz questions."""
-        return f"""Create a multiple-choice quiz question about {title}. {purpose}.
-
-Return your response in this exact JSON format:
-{{
-  "question_text": "Clear, specific question about {title}",
-  "options": ["Option A", "Option B", "Option C", "Option D"],
-  "correct_index": 0,
-  "explanation": "Brief explanation of why the correct answer is right"
-}}
-
-Make the question challenging but fair, and ensure all options are plausible."""
+        return QUIZ_PROMPT_TEMPLATE.format(title=title, purpose=purpose)
     
     def create_knowledge_component(self, 
                                  learning_objective,
@@ -160,16 +298,13 @@ Make the question challenging but fair, and ensure all options are plausible."""
             check_plan['purpose']
         )
         
-        quiz_data = result['quiz_data']
-        
-        return ComprehensionCheck.objects.create(
-            learning_objective=learning_objective,
-            question_text=quiz_data['question_text'],
-            options=quiz_data['options'],
-            correct_index=quiz_data['correct_index'],
-            explanation=quiz_data['explanation'],
-            validation_status='PENDING'
-        )
+        return store_comprehension_check(learning_objective, result['quiz_data'])
+
+
+@lru_cache(maxsize=1)
+def get_worker_service() -> SimplifiedWorkerService:
+    """Get the shared worker service."""
+    return SimplifiedWorkerService()
 
 
 def process_knowledge_components(learning_objective, components_plan: list) -> list:
@@ -177,26 +312,58 @@ def process_knowledge_components(learning_objective, components_plan: list) -> l
     Process all knowledge components for a learning objective.
     Simplified version for MVP.
     """
-    service = SimplifiedWorkerService()
-    created_components = []
+    service = get_worker_service()
     
-    for component_plan in components_plan:
-        try:
-            component = service.create_knowledge_component(learning_objective, component_plan)
-            created_components.append(component)
-            logger.info(f"Created {component.type} component: {component.id}")
-        except Exception as e:
-            logger.error(f"Failed to create component {component_plan['type']}: {e}")
+    # Generate all component content in one call, then store it in plan order
+    results = run_sync(service.agenerate_all_components(learning_objective.title, components_plan))
+    return store_knowledge_components(learning_objective, components_plan, results)
+
+
+def store_knowledge_components(learning_objective, components_plan: list, results: list) -> list:
+    """
+    Store generated component content, pairing each plan with its result.
+    All components are inserted in one transaction.
+    """
+    components = [
+        KnowledgeComponent(
+            learning_objective=learning_objective,
+            type=component_plan['type'],
+            content=result['content'],
+            sort_order=component_plan['sort_order'],
+            validation_status='PENDING'
+        )
+        for component_plan, result in zip(components_plan, results)
+    ]
     
+    try:
+        with transaction.atomic():
+            created_components = KnowledgeComponent.objects.bulk_create(components, batch_size=500)
+    except Exception as e:
+        logger.error(f"Failed to create components for {learning_objective.id}: {e}")
+        return []
+    
+    logger.info(f"Created {len(created_components)} components for: {learning_objective.id}")
     return created_components
 
 
+def store_comprehension_check(learning_objective, quiz_data: Dict[str, Any]) -> ComprehensionCheck:
+    """Store a generated comprehension check."""
+    return ComprehensionCheck.objects.create(
+        learning_objective=learning_objective,
+        question_text=quiz_data['question_text'],
+        options=quiz_data['options'],
+        correct_index=quiz_data['correct_index'],
+        explanation=quiz_data['explanation'],
+        validation_status='PENDING'
+    )
+
+
 def process_comprehension_check(learning_objective, check_plan: Dict[str, Any]) -> ComprehensionCheck:
     """
     Process comprehension check for a learning objective.
     Simplified version for MVP.
     """
-    service = SimplifiedWorkerService()
+    service = get_worker_service()
     
     try:
         check = service.create_comprehension_check(learning_objective, check_plan)
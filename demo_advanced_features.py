@@ -5,9 +5,12 @@ Demonstrates avatar customization, topic management, and monitoring
 """
 
 import os
+import io
 import sys
 import json
 import time
+import functools
+from contextlib import redirect_stdout
 from datetime import datetime
 
 # Add the project root to Python path
@@ -19,9 +22,32 @@ load_dotenv()
 
 # Import our modules
 from avatars.customization import AvatarCustomizer, PersonalityTrait, TeachingStyle
-from content.topic_manager import TopicManager, Topic, SubjectArea, DifficultyLevel, ContentType
+from content.topic_manager import TopicManager, Topic, SubjectArea, DifficultyLevel, ContentType, now_iso
 from monitoring.alert_system import MonitoringSystem, AlertLevel, AlertType
 
+# Avatar (name, role) for each subject area; other subjects use DEFAULT_AVATAR
+SUBJECT_AVATARS = {
+    SubjectArea.SCIENCE: ("kelly", "Academic Specialist"),
+    SubjectArea.MATHEMATICS: ("kelly", "Academic Specialist")
+}
+DEFAULT_AVATAR = ("ken", "Practical Expert")
+
+# Number of topics generated together in the integrated workflow demo
+WORKFLOW_BATCH_SIZE = 3
+
+def buffered_output(method):
+    """Collect everything a demo step prints and write it to stdout in one go"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        buffer = io.StringIO()
+        try:
+            # Redirecting keeps prints from the customizer, manager and monitor in order
+            with redirect_stdout(buffer):
+                return method(*args, **kwargs)
+        finally:
+            sys.stdout.write(buffer.getvalue())
+    return wrapper
+
 class AdvancedFeaturesDemo:
     """Demo of advanced Phoenix Knowledge Engine features"""
     
@@ -33,6 +59,7 @@ class AdvancedFeaturesDemo:
         print("🎯 Phoenix Knowledge Engine - Advanced Features Demo")
         print("=" * 60)
     
+    @buffered_output
     def demo_avatar_customization(self):
         """Demonstrate avatar customization features"""
         print("\n🎭 AVATAR CUSTOMIZATION DEMO")
@@ -44,7 +71,7 @@ class AdvancedFeaturesDemo:
         # Get Kelly's current configuration
         kelly_config = self.avatar_customizer.get_avatar_config("kelly")
         if kelly_config:
-            print(f"\nKelly's current traits: {[t.value for t in kelly_config.personality_traits]}")
+            print(f"\nKelly's current traits: {', '.join(kelly_config.trait_values)}")
             print(f"Kelly's expertise: {kelly_config.expertise_areas}")
         
         # Add creative trait to Kelly
@@ -76,9 +103,10 @@ class AdvancedFeaturesDemo:
         
         # Show updated configuration
         updated_kelly = self.avatar_customizer.get_avatar_config("kelly")
-        print(f"\nKelly's updated traits: {[t.value for t in updated_kelly.personality_traits]}")
+        print(f"\nKelly's updated traits: {', '.join(updated_kelly.trait_values)}")
         print(f"Kelly's updated expertise: {updated_kelly.expertise_areas}")
     
+    @buffered_output
     def demo_topic_management(self):
         """Demonstrate topic management features"""
         print("\n📚 TOPIC MANAGEMENT DEMO")
@@ -97,9 +125,9 @@ class AdvancedFeaturesDemo:
         
         # Get topics by difficulty
         print("\n📊 Topics by difficulty:")
+        by_difficulty = self.topic_manager.get_topic_statistics()['by_difficulty']
         for difficulty in DifficultyLevel:
-            topics = self.topic_manager.get_topics_by_difficulty(difficulty)
-            print(f"  {difficulty.value}: {len(topics)} topics")
+            print(f"  {difficulty.value}: {by_difficulty.get(difficulty.value, 0)} topics")
         
         # Add a new topic
         print("\n➕ Adding new topic: 'Climate Change'...")
@@ -118,8 +146,8 @@ class AdvancedFeaturesDemo:
             prerequisites=["basic science", "environmental awareness"],
             estimated_duration=80,
             tags=["environment", "science", "sustainability"],
-            created_date=datetime.now().isoformat(),
-            last_updated=datetime.now().isoformat()
+            created_date=now_iso(),
+            last_updated=now_iso()
         )
         
         success = self.topic_manager.add_topic(new_topic)
@@ -129,7 +157,7 @@ class AdvancedFeaturesDemo:
         # Get random topics for content generation
         print("\n🎲 Getting random topics for content generation...")
         random_topics = self.topic_manager.get_random_topics(3)
-        print(f"Random topics: {[t.name for t in random_topics]}")
+        print(f"Random topics: {', '.join(t.name for t in random_topics)}")
         
         # Get topic statistics
         print("\n📈 Topic statistics:")
@@ -139,6 +167,7 @@ class AdvancedFeaturesDemo:
         print(f"  By difficulty: {stats['by_difficulty']}")
         print(f"  Average duration: {stats['average_duration']:.1f} minutes")
     
+    @buffered_output
     def demo_monitoring_system(self):
         """Demonstrate monitoring and alerting features"""
         print("\n📊 MONITORING SYSTEM DEMO")
@@ -146,20 +175,22 @@ class AdvancedFeaturesDemo:
         
         # Simulate some API calls
         print("🔄 Simulating API calls...")
-        self.monitoring.track_api_call("gpt-3.5-turbo", 100, 50, 1.2, True)
-        self.monitoring.track_api_call("gpt-3.5-turbo", 200, 100, 2.1, True)
-        self.monitoring.track_api_call("gpt-3.5-turbo", 150, 75, 0.8, False)
-        self.monitoring.track_api_call("gpt-4", 300, 150, 3.5, True)
+        self.monitoring.track_api_calls_bulk([
+            ("gpt-3.5-turbo", 100, 50, 1.2, True),
+            ("gpt-3.5-turbo", 200, 100, 2.1, True),
+            ("gpt-3.5-turbo", 150, 75, 0.8, False),
+            ("gpt-4", 300, 150, 3.5, True)
+        ])
         
         # Get metrics summary
         print("\n📈 Current metrics:")
         summary = self.monitoring.get_metrics_summary()
-        print(f"  Total cost: ${summary['total_cost']:.4f}")
-        print(f"  Total calls: {summary['total_calls']}")
-        print(f"  Success rate: {summary['success_rate']:.1f}%")
-        print(f"  Error rate: {summary['error_rate']:.1f}%")
-        print(f"  Average response time: {summary['average_response_time']:.2f}s")
-        print(f"  Active alerts: {summary['active_alerts']}")
+        print(f"  Total cost: ${summary.total_cost:.4f}")
+        print(f"  Total calls: {summary.total_calls}")
+        print(f"  Success rate: {summary.success_rate:.1f}%")
+        print(f"  Error rate: {summary.error_rate:.1f}%")
+        print(f"  Average response time: {summary.average_response_time:.2f}s")
+        print(f"  Active alerts: {summary.active_alerts}")
         
         # Check for alerts
         print("\n🚨 Checking for alerts...")
@@ -191,61 +222,62 @@ class AdvancedFeaturesDemo:
         export_file = self.monitoring.export_alerts()
         print(f"Alerts exported to: {export_file}")
     
+    @buffered_output
     def demo_integrated_workflow(self):
         """Demonstrate integrated workflow with all features"""
         print("\n🔄 INTEGRATED WORKFLOW DEMO")
         print("-" * 40)
         
-        # Get a random topic
-        random_topics = self.topic_manager.get_random_topics(1)
-        if not random_topics:
+        # Get a batch of random topics
+        topics = self.topic_manager.get_random_topics(WORKFLOW_BATCH_SIZE)
+        if not topics:
             print("No topics available for demo")
             return
         
-        topic = random_topics[0]
-        print(f"Selected topic: {topic.name}")
-        print(f"Subject area: {topic.subject_area.value}")
-        print(f"Difficulty: {topic.difficulty_level.value}")
-        
-        # Select appropriate avatar based on topic
-        if topic.subject_area in [SubjectArea.SCIENCE, SubjectArea.MATHEMATICS]:
-            avatar_name = "kelly"
-            avatar_type = "Academic Specialist"
-        else:
-            avatar_name = "ken"
-            avatar_type = "Practical Expert"
-        
-        print(f"Selected avatar: {avatar_name} ({avatar_type})")
-        
-        # Generate custom prompt
-        custom_prompt = self.avatar_customizer.generate_custom_prompt(
-            avatar_name,
-            "core_concept",
-            topic.name,
-            example="a practical example"
-        )
-        
-        print(f"\nGenerated prompt preview:\n{custom_prompt[:300]}...")
+        # Select appropriate avatar for each topic, grouping topics by avatar
+        topics_by_avatar = {}
+        for topic in topics:
+            avatar_name, avatar_type = SUBJECT_AVATARS.get(topic.subject_area, DEFAULT_AVATAR)
+            topics_by_avatar.setdefault((avatar_name, avatar_type), []).append(topic)
+            print(f"Selected topic: {topic.name} ({topic.subject_area.value}, "
+                  f"{topic.difficulty_level.value}) -> {avatar_name} ({avatar_type})")
+        
+        # Generate custom prompts, one batch per avatar
+        prompts = []
+        for (avatar_name, _), avatar_topics in topics_by_avatar.items():
+            prompts += zip(avatar_topics, self.avatar_customizer.generate_custom_prompts(
+                avatar_name,
+                "core_concept",
+                [topic.name for topic in avatar_topics],
+                example="a practical example"
+            ))
+        
+        topic, custom_prompt = prompts[0]
+        print(f"\nGenerated {len(prompts)} prompts; preview for '{topic.name}':\n{custom_prompt[:300]}...")
         
         # Simulate content generation with monitoring
-        print(f"\n🎯 Generating content for '{topic.name}'...")
-        start_time = time.time()
-        
-        # Simulate API call
-        success = True  # In real implementation, this would call OpenAI API
-        response_time = time.time() - start_time
+        print(f"\n🎯 Generating content for {len(prompts)} topics...")
+        records = []
+        for topic, custom_prompt in prompts:
+            start_time = time.time()
+            
+            # Simulate API call
+            success = True  # In real implementation, this would call OpenAI API
+            response_time = time.time() - start_time
+            
+            records.append((
+                "gpt-3.5-turbo",
+                200,  # input tokens
+                100,  # output tokens
+                response_time,
+                success
+            ))
         
-        # Track the API call
-        self.monitoring.track_api_call(
-            "gpt-3.5-turbo",
-            200,  # input tokens
-            100,  # output tokens
-            response_time,
-            success
-        )
+        # Track the API calls
+        self.monitoring.track_api_calls_bulk(records)
         
         print(f"✅ Content generated successfully!")
-        print(f"⏱️  Response time: {response_time:.2f}s")
+        print(f"⏱️  Total response time: {sum(record[3] for record in records):.2f}s")
         
         # Check if any alerts were triggered
         alerts = self.monitoring.get_alerts(resolved=False)
@@ -279,9 +311,9 @@ class AdvancedFeaturesDemo:
             
             # Show final metrics
             final_summary = self.monitoring.get_metrics_summary()
-            print(f"\n💰 Total cost: ${final_summary['total_cost']:.4f}")
-            print(f"📞 Total API calls: {final_summary['total_calls']}")
-            print(f"📈 Success rate: {final_summary['success_rate']:.1f}%")
+            print(f"\n💰 Total cost: ${final_summary.total_cost:.4f}")
+            print(f"📞 Total API calls: {final_summary.total_calls}")
+            print(f"📈 Success rate: {final_summary.success_rate:.1f}%")
             
             print(f"\n🎯 All systems operational and ready for production!")
             
@@ -3,16 +3,71 @@ Advanced Monitoring and Alert System for Phoenix Knowledge Engine
 Tracks system health, costs, performance, and sends alerts
 """
 
+import atexit
 import json
 import os
+import orjson
+import queue
 import time
 import smtplib
-import requests
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, asdict, fields
 from enum import Enum
+from functools import cached_property
 import logging
+from logging.handlers import QueueHandler, QueueListener
+from array import array
+from collections import defaultdict
+from collections.abc import Mapping
+from itertools import count
+from monitoring.pricing import MODEL_TOKEN_COSTS, DEFAULT_PRICING_MODEL
+
+# Number of recent response times kept for the average
+RESPONSE_TIME_WINDOW = 100
+
+# (connect, read) timeout in seconds for alert webhooks
+ALERT_HTTP_TIMEOUT = (1.0, 5.0)
+
+# Content type for the orjson-encoded webhook bodies
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Default for the alert_batch_size setting, and most alerts waiting to be sent
+ALERT_BATCH_SIZE = 20
+ALERT_QUEUE_SIZE = 1000
+
+# Alert timestamps are kept to the second, so each second is formatted only once
+_iso_cache = (0, "")
+
+def _now_iso() -> str:
+    """ISO timestamp of the current local second"""
+    global _iso_cache
+    second = int(time.time())
+    if _iso_cache[0] != second:
+        _iso_cache = (second, datetime.fromtimestamp(second).isoformat())
+    return _iso_cache[1]
+
+# Shared by every webhook channel so posts skip the TCP/TLS handshake; created
+# with the first webhook channel, so requests is only imported when one is configured
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def _get_http_session() -> 'requests.Session':
+    """Session whose pooled keep-alive connections are shared by all webhook channels"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            # An integer max_retries only retries failed connections, so alerts are never posted twice
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=3)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_session = session
+        return _http_session
 
 class AlertLevel(Enum):
     INFO = "info"
@@ -27,6 +82,35 @@ class AlertType(Enum):
     SYSTEM = "system"
     SECURITY = "security"
 
+# Levels from least to most severe
+ALERT_LEVEL_ORDER = list(AlertLevel)
+
+# Seconds before an alert with the same type and title is sent to the channels again
+ALERT_COOLDOWN_SECONDS = {
+    AlertLevel.INFO: 300,
+    AlertLevel.WARNING: 300,
+    AlertLevel.ERROR: 300,
+    AlertLevel.CRITICAL: 60
+}
+
+# Labels and Slack attachment colours, worked out once per level instead of per send
+ALERT_LEVEL_LABELS = {level: level.value.upper() for level in AlertLevel}
+SLACK_LEVEL_COLORS = {
+    AlertLevel.INFO: "good",
+    AlertLevel.WARNING: "warning",
+    AlertLevel.ERROR: "danger",
+    AlertLevel.CRITICAL: "danger"
+}
+
+# Slack attachment fields that only depend on the level or type; shared by every
+# payload, which is safe as payloads are only read when they are encoded
+SLACK_LEVEL_FIELDS = {
+    level: {"title": "Level", "value": label, "short": True} for level, label in ALERT_LEVEL_LABELS.items()
+}
+SLACK_TYPE_FIELDS = {
+    alert_type: {"title": "Type", "value": alert_type.value, "short": True} for alert_type in AlertType
+}
+
 @dataclass
 class Alert:
     """Represents a system alert"""
@@ -40,10 +124,33 @@ class Alert:
     resolved_at: Optional[str] = None
     metadata: Dict[str, Any] = None
 
+@dataclass(frozen=True)
+class Thresholds:
+    """Alert thresholds, read once from the monitoring configuration"""
+    cost_daily_limit: float = 5.0
+    cost_monthly_limit: float = 50.0
+    cost_warning_percentage: float = 80
+    response_time_limit: float = 5.0
+    error_rate_limit: float = 5.0
+    memory_usage_limit: float = 80.0
+    cpu_usage_limit: float = 80.0
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'Thresholds':
+        """Build thresholds from a config dict, ignoring unknown keys"""
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in config.items() if key in names})
+
 class AlertChannel:
     """Base class for alert channels"""
+    
     def send_alert(self, alert: Alert) -> bool:
         raise NotImplementedError
+    
+    def send_alerts(self, alerts: List[Alert]) -> bool:
+        """Send several alerts; channels that can combine them override this"""
+        results = [self.send_alert(alert) for alert in alerts]
+        return all(results)
 
 class EmailAlertChannel(AlertChannel):
     """Email alert channel"""
@@ -56,33 +163,88 @@ class EmailAlertChannel(AlertChannel):
         self.password = password
         self.from_email = from_email
         self.to_emails = to_emails
+        # One logged-in connection reused across alerts; smtplib.SMTP is not thread-safe
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_lock = threading.Lock()
+    
+    def _connect(self) -> smtplib.SMTP:
+        """Open a new SMTP connection, upgrade it to TLS and log in"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            server.starttls()
+            server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    def _sendmail(self, msg: str):
+        """Send over the open connection, reconnecting once if the server dropped it"""
+        with self._smtp_lock:
+            try:
+                if self._smtp is None:
+                    self._smtp = self._connect()
+                try:
+                    self._smtp.sendmail(self.from_email, self.to_emails, msg)
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # Idle connections are closed by the server; retry on a fresh one
+                    self._smtp.close()
+                    self._smtp = None
+                    self._smtp = self._connect()
+                    self._smtp.sendmail(self.from_email, self.to_emails, msg)
+            except Exception:
+                # Start the next alert on a clean connection
+                if self._smtp is not None:
+                    self._smtp.close()
+                    self._smtp = None
+                raise
+    
+    def close(self):
+        """Close the SMTP connection if one is open"""
+        with self._smtp_lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except Exception:
+                    self._smtp.close()
+                self._smtp = None
     
     def send_alert(self, alert: Alert) -> bool:
         """Send alert via email"""
+        return self.send_alerts([alert])
+    
+    def send_alerts(self, alerts: List[Alert]) -> bool:
+        """Send alerts via email, combining a batch into a single message"""
         try:
-            subject = f"[{alert.level.value.upper()}] Phoenix Knowledge Engine: {alert.title}"
-            body = f"""
-Alert ID: {alert.id}
-Level: {alert.level.value.upper()}
-Type: {alert.alert_type.value}
-Time: {alert.timestamp}
-
-{alert.message}
-
-Metadata: {json.dumps(alert.metadata or {}, indent=2)}
-            """
+            if len(alerts) == 1:
+                alert = alerts[0]
+                subject = f"[{ALERT_LEVEL_LABELS[alert.level]}] Phoenix Knowledge Engine: {alert.title}"
+            else:
+                top_level = max((alert.level for alert in alerts), key=ALERT_LEVEL_ORDER.index)
+                subject = f"[{ALERT_LEVEL_LABELS[top_level]}] Phoenix Knowledge Engine: {len(alerts)} alerts"
+            body = "\n".join(self._format_alert(alert) for alert in alerts)
             
             msg = f"Subject: {subject}\n\n{body}"
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.username, self.password)
-                server.sendmail(self.from_email, self.to_emails, msg)
+            self._sendmail(msg)
             
             return True
         except Exception as e:
             print(f"❌ Failed to send email alert: {e}")
             return False
+    
+    def _format_alert(self, alert: Alert) -> str:
+        """Email body section for one alert"""
+        return f"""
+Alert ID: {alert.id}
+Level: {ALERT_LEVEL_LABELS[alert.level]}
+Type: {alert.alert_type.value}
+Time: {alert.timestamp}
+
+{alert.message}
+
+Metadata: {json.dumps(alert.metadata or {}, indent=2)}
+            """
 
 class SlackAlertChannel(AlertChannel):
     """Slack alert channel"""
@@ -90,26 +252,20 @@ class SlackAlertChannel(AlertChannel):
     def __init__(self, webhook_url: str, channel: str = "#alerts"):
         self.webhook_url = webhook_url
         self.channel = channel
+        self._session = _get_http_session()
     
     def send_alert(self, alert: Alert) -> bool:
         """Send alert via Slack"""
         try:
-            color_map = {
-                AlertLevel.INFO: "good",
-                AlertLevel.WARNING: "warning",
-                AlertLevel.ERROR: "danger",
-                AlertLevel.CRITICAL: "danger"
-            }
-            
             payload = {
                 "channel": self.channel,
                 "attachments": [{
-                    "color": color_map.get(alert.level, "good"),
+                    "color": SLACK_LEVEL_COLORS.get(alert.level, "good"),
                     "title": f"Phoenix Knowledge Engine Alert: {alert.title}",
                     "text": alert.message,
                     "fields": [
-                        {"title": "Level", "value": alert.level.value.upper(), "short": True},
-                        {"title": "Type", "value": alert.alert_type.value, "short": True},
+                        SLACK_LEVEL_FIELDS[alert.level],
+                        SLACK_TYPE_FIELDS[alert.alert_type],
                         {"title": "Time", "value": alert.timestamp, "short": True},
                         {"title": "Alert ID", "value": alert.id, "short": True}
                     ],
@@ -118,7 +274,8 @@ class SlackAlertChannel(AlertChannel):
                 }]
             }
             
-            response = requests.post(self.webhook_url, json=payload)
+            response = self._session.post(self.webhook_url, data=orjson.dumps(payload), headers=JSON_HEADERS,
+                                          timeout=ALERT_HTTP_TIMEOUT)
             return response.status_code == 200
         except Exception as e:
             print(f"❌ Failed to send Slack alert: {e}")
@@ -130,6 +287,9 @@ class WebhookAlertChannel(AlertChannel):
     def __init__(self, webhook_url: str, headers: Dict[str, str] = None):
         self.webhook_url = webhook_url
         self.headers = headers or {"Content-Type": "application/json"}
+        self._session = _get_http_session()
+        # The body is sent pre-encoded, so it needs its content type even when custom headers omit it
+        self._post_headers = {**JSON_HEADERS, **self.headers}
     
     def send_alert(self, alert: Alert) -> bool:
         """Send alert via webhook"""
@@ -145,30 +305,113 @@ class WebhookAlertChannel(AlertChannel):
                 "metadata": alert.metadata or {}
             }
             
-            response = requests.post(self.webhook_url, json=payload, headers=self.headers)
+            body = orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+            response = self._session.post(self.webhook_url, data=body, headers=self._post_headers,
+                                          timeout=ALERT_HTTP_TIMEOUT)
             return response.status_code in [200, 201, 202]
         except Exception as e:
             print(f"❌ Failed to send webhook alert: {e}")
             return False
 
+class MetricsView(Mapping):
+    """
+    Metrics summary whose derived fields are computed when first read.
+    Fields can be read as attributes or as keys, like the dict it replaces;
+    use to_dict() for JSON.
+    """
+    
+    FIELDS = (
+        "total_cost", "total_calls", "successful_calls", "failed_calls", "success_rate",
+        "error_rate", "average_response_time", "active_alerts", "total_alerts"
+    )
+    
+    def __init__(self, monitoring: 'MonitoringSystem'):
+        self._monitoring = monitoring
+        self.total_cost = monitoring.metrics["total_cost"]
+        self.total_calls = monitoring.metrics["total_calls"]
+        self.successful_calls = monitoring.metrics["successful_calls"]
+        self.failed_calls = monitoring.metrics["failed_calls"]
+    
+    @cached_property
+    def success_rate(self) -> float:
+        return (self.successful_calls / self.total_calls * 100) if self.total_calls > 0 else 0
+    
+    @cached_property
+    def error_rate(self) -> float:
+        return (self.failed_calls / self.total_calls * 100) if self.total_calls > 0 else 0
+    
+    @cached_property
+    def average_response_time(self) -> float:
+        return self._monitoring._average_response_time()
+    
+    @cached_property
+    def active_alerts(self) -> int:
+        return len(self._monitoring._unresolved_alerts)
+    
+    @cached_property
+    def total_alerts(self) -> int:
+        return len(self._monitoring.alerts)
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __iter__(self):
+        return iter(self.FIELDS)
+    
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Materialize every field as a plain dictionary"""
+        return dict(self)
+
 class MonitoringSystem:
     """Main monitoring and alerting system"""
     
     def __init__(self, config_file: str = "monitoring_config.json"):
         self.config_file = config_file
         self.alerts = []
+        # Sequence numbers for alert IDs; next() on a count is atomic, so IDs never repeat across threads
+        self._alert_ids = count()
+        # Alerts by ID and by level, and unresolved alerts by ID, in creation order
+        self._alerts_by_id: Dict[str, Alert] = {}
+        self._alerts_by_level: Dict[AlertLevel, List[Alert]] = defaultdict(list)
+        self._unresolved_alerts: Dict[str, Alert] = {}
         self.alert_channels = []
-        self.metrics = {}
-        self.thresholds = {}
+        self.alert_batch_size = ALERT_BATCH_SIZE
+        self.alert_cooldowns = dict(ALERT_COOLDOWN_SECONDS)
+        # Monotonic time each (alert type, title) was last sent to the channels
+        self._last_sent: Dict[Tuple[AlertType, str], float] = {}
+        # Alerts are queued and delivered in batches in the background, to all channels at once
+        self._alert_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='alert-dispatch')
+        self._alert_queue: queue.Queue = queue.Queue(maxsize=ALERT_QUEUE_SIZE)
+        self._alert_worker = threading.Thread(
+            target=self._drain_alert_queue, name='alert-queue', daemon=True
+        )
+        self._alert_worker.start()
+        self.metrics = {"total_cost": 0.0, "total_calls": 0, "successful_calls": 0, "failed_calls": 0}
+        self.thresholds = Thresholds()
+        # Ring buffer of the most recent response times
+        self._response_times = array('d', [0.0]) * RESPONSE_TIME_WINDOW
+        self._response_index = 0
+        self._response_count = 0
+        self._response_time_sum = 0.0
         self.load_config()
         self.setup_logging()
+        # Registered after the log listener so queued alerts are sent before it stops
+        atexit.register(self._stop_alert_worker)
     
     def load_config(self):
         """Load monitoring configuration"""
         if os.path.exists(self.config_file):
             with open(self.config_file, 'r') as f:
                 config = json.load(f)
-                self.thresholds = config.get('thresholds', {})
+                self.thresholds = Thresholds.from_config(config.get('thresholds', {}))
+                self.alert_batch_size = config.get('alert_batch_size', ALERT_BATCH_SIZE)
+                for level, seconds in config.get('alert_cooldowns', {}).items():
+                    self.alert_cooldowns[AlertLevel(level)] = seconds
                 self.setup_alert_channels(config.get('alert_channels', {}))
         else:
             self._create_default_config()
@@ -176,15 +419,9 @@ class MonitoringSystem:
     def _create_default_config(self):
         """Create default monitoring configuration"""
         default_config = {
-            "thresholds": {
-                "cost_daily_limit": 5.0,
-                "cost_monthly_limit": 50.0,
-                "cost_warning_percentage": 80,
-                "response_time_limit": 5.0,
-                "error_rate_limit": 5.0,
-                "memory_usage_limit": 80.0,
-                "cpu_usage_limit": 80.0
-            },
+            "thresholds": asdict(Thresholds()),
+            "alert_batch_size": ALERT_BATCH_SIZE,
+            "alert_cooldowns": {level.value: seconds for level, seconds in ALERT_COOLDOWN_SECONDS.items()},
             "alert_channels": {
                 "email": {
                     "enabled": False,
@@ -211,7 +448,7 @@ class MonitoringSystem:
         with open(self.config_file, 'w') as f:
             json.dump(default_config, f, indent=2)
         
-        self.thresholds = default_config["thresholds"]
+        self.thresholds = Thresholds()
     
     def setup_alert_channels(self, channels_config: Dict):
         """Setup alert channels based on configuration"""
@@ -248,50 +485,111 @@ class MonitoringSystem:
     
     def setup_logging(self):
         """Setup logging for monitoring"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('monitoring.log'),
-                logging.StreamHandler()
-            ]
-        )
+        self._log_listener = None
+        if not logging.root.handlers:
+            # Records are formatted and written by a background listener thread
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handlers = [logging.FileHandler('monitoring.log'), logging.StreamHandler()]
+            for handler in handlers:
+                handler.setFormatter(formatter)
+            log_queue = queue.Queue(-1)
+            self._log_listener = QueueListener(log_queue, *handlers)
+            self._log_listener.start()
+            atexit.register(self._log_listener.stop)
+            queue_handler = QueueHandler(log_queue)
+            queue_handler.setFormatter(logging.Formatter('%(message)s'))
+            logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
         self.logger = logging.getLogger('PhoenixMonitoring')
     
     def create_alert(self, level: AlertLevel, alert_type: AlertType, title: str, 
                     message: str, metadata: Dict[str, Any] = None) -> Alert:
         """Create a new alert"""
-        alert_id = f"alert_{int(time.time())}_{len(self.alerts)}"
+        alert_id = f"alert_{int(time.time())}_{next(self._alert_ids)}"
         alert = Alert(
             id=alert_id,
             level=level,
             alert_type=alert_type,
             title=title,
             message=message,
-            timestamp=datetime.now().isoformat(),
+            timestamp=_now_iso(),
             metadata=metadata or {}
         )
         
         self.alerts.append(alert)
-        self.logger.info(f"Created alert: {alert_id} - {title}")
+        self._alerts_by_id[alert_id] = alert
+        self._alerts_by_level[level].append(alert)
+        self._unresolved_alerts[alert_id] = alert
+        self.logger.info("Created alert: %s - %s", alert_id, title)
         
-        # Send alert through all channels
-        for channel in self.alert_channels:
-            try:
-                channel.send_alert(alert)
-            except Exception as e:
-                self.logger.error(f"Failed to send alert through channel: {e}")
+        # Queue the alert for the channels without waiting for delivery, unless
+        # the same alert was sent within its cooldown
+        if self.alert_channels:
+            key = (alert_type, title)
+            now = time.monotonic()
+            last_sent = self._last_sent.get(key)
+            if last_sent is not None and now - last_sent < self.alert_cooldowns[level]:
+                self.logger.debug("Alert in cooldown, not sending: %s", alert_id)
+            else:
+                try:
+                    self._alert_queue.put_nowait(alert)
+                    self._last_sent[key] = now
+                except queue.Full:
+                    self.logger.error(f"Alert queue full, not sending alert: {alert_id}")
         
         return alert
     
+    def _drain_alert_queue(self):
+        """Send queued alerts to every channel, up to alert_batch_size at a time"""
+        while True:
+            batch = [self._alert_queue.get()]
+            while len(batch) < self.alert_batch_size:
+                try:
+                    batch.append(self._alert_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = None in batch
+            batch = [alert for alert in batch if alert is not None]
+            for channel in self.alert_channels if batch else ():
+                try:
+                    future = self._alert_executor.submit(channel.send_alerts, batch)
+                except RuntimeError:
+                    # The executor is shut down at interpreter exit; deliver inline
+                    future = Future()
+                    try:
+                        future.set_result(channel.send_alerts(batch))
+                    except Exception as e:
+                        future.set_exception(e)
+                future.add_done_callback(
+                    lambda f, channel=channel, batch=batch: self._log_alert_delivery(f, channel, batch)
+                )
+            if stop:
+                return
+    
+    def _stop_alert_worker(self, timeout: float = 10.0):
+        """Deliver the alerts still queued and stop the queue worker"""
+        self._alert_queue.put(None)
+        self._alert_worker.join(timeout)
+    
+    def _log_alert_delivery(self, future: Future, channel: AlertChannel, alerts: List[Alert]):
+        """Log alerts that a channel failed to deliver"""
+        try:
+            delivered = future.result()
+        except Exception as e:
+            self.logger.error(f"Failed to send alert through channel: {e}")
+            return
+        if not delivered:
+            alert_ids = ", ".join(alert.id for alert in alerts)
+            self.logger.warning(f"{type(channel).__name__} did not deliver alerts: {alert_ids}")
+    
     def check_cost_thresholds(self, current_cost: float, period: str = "daily"):
         """Check cost thresholds and create alerts if needed"""
         if period == "daily":
-            limit = self.thresholds.get("cost_daily_limit", 5.0)
-            warning_threshold = limit * (self.thresholds.get("cost_warning_percentage", 80) / 100)
+            limit = self.thresholds.cost_daily_limit
+            warning_threshold = limit * (self.thresholds.cost_warning_percentage / 100)
         else:  # monthly
-            limit = self.thresholds.get("cost_monthly_limit", 50.0)
-            warning_threshold = limit * (self.thresholds.get("cost_warning_percentage", 80) / 100)
+            limit = self.thresholds.cost_monthly_limit
+            warning_threshold = limit * (self.thresholds.cost_warning_percentage / 100)
         
         if current_cost >= limit:
             self.create_alert(
@@ -314,165 +612,166 @@ class MonitoringSystem:
                                 memory_usage: float, cpu_usage: float):
         """Check performance metrics and create alerts if needed"""
         # Response time check
-        if response_time > self.thresholds.get("response_time_limit", 5.0):
+        if response_time > self.thresholds.response_time_limit:
             self.create_alert(
                 AlertLevel.WARNING,
                 AlertType.PERFORMANCE,
                 "High Response Time",
-                f"API response time: {response_time:.2f}s exceeds limit of {self.thresholds.get('response_time_limit', 5.0)}s",
-                {"response_time": response_time, "limit": self.thresholds.get("response_time_limit", 5.0)}
+                f"API response time: {response_time:.2f}s exceeds limit of {self.thresholds.response_time_limit}s",
+                {"response_time": response_time, "limit": self.thresholds.response_time_limit}
             )
         
         # Error rate check
-        if error_rate > self.thresholds.get("error_rate_limit", 5.0):
+        if error_rate > self.thresholds.error_rate_limit:
             self.create_alert(
                 AlertLevel.ERROR,
                 AlertType.ERROR,
                 "High Error Rate",
-                f"Error rate: {error_rate:.1f}% exceeds limit of {self.thresholds.get('error_rate_limit', 5.0)}%",
-                {"error_rate": error_rate, "limit": self.thresholds.get("error_rate_limit", 5.0)}
+                f"Error rate: {error_rate:.1f}% exceeds limit of {self.thresholds.error_rate_limit}%",
+                {"error_rate": error_rate, "limit": self.thresholds.error_rate_limit}
             )
         
         # Memory usage check
-        if memory_usage > self.thresholds.get("memory_usage_limit", 80.0):
+        if memory_usage > self.thresholds.memory_usage_limit:
             self.create_alert(
                 AlertLevel.WARNING,
                 AlertType.SYSTEM,
                 "High Memory Usage",
-                f"Memory usage: {memory_usage:.1f}% exceeds limit of {self.thresholds.get('memory_usage_limit', 80.0)}%",
-                {"memory_usage": memory_usage, "limit": self.thresholds.get("memory_usage_limit", 80.0)}
+                f"Memory usage: {memory_usage:.1f}% exceeds limit of {self.thresholds.memory_usage_limit}%",
+                {"memory_usage": memory_usage, "limit": self.thresholds.memory_usage_limit}
             )
         
         # CPU usage check
-        if cpu_usage > self.thresholds.get("cpu_usage_limit", 80.0):
+        if cpu_usage > self.thresholds.cpu_usage_limit:
             self.create_alert(
                 AlertLevel.WARNING,
                 AlertType.SYSTEM,
                 "High CPU Usage",
-                f"CPU usage: {cpu_usage:.1f}% exceeds limit of {self.thresholds.get('cpu_usage_limit', 80.0)}%",
-                {"cpu_usage": cpu_usage, "limit": self.thresholds.get("cpu_usage_limit", 80.0)}
+                f"CPU usage: {cpu_usage:.1f}% exceeds limit of {self.thresholds.cpu_usage_limit}%",
+                {"cpu_usage": cpu_usage, "limit": self.thresholds.cpu_usage_limit}
             )
     
     def track_api_call(self, model: str, input_tokens: int, output_tokens: int, 
                       response_time: float, success: bool):
         """Track an API call and update metrics"""
+        self._record_api_call(model, input_tokens, output_tokens, response_time, success)
+        self._check_call_thresholds()
+    
+    def track_api_calls_bulk(self, records: List[Tuple[str, int, int, float, bool]]):
+        """
+        Track several API calls at once.
+        Each record is (model, input_tokens, output_tokens, response_time, success);
+        thresholds are checked once against the totals after the whole batch.
+        """
+        if not records:
+            return
+        for record in records:
+            self._record_api_call(*record)
+        self._check_call_thresholds()
+    
+    def _record_api_call(self, model: str, input_tokens: int, output_tokens: int,
+                         response_time: float, success: bool):
+        """Update metrics for one API call"""
         # Update cost metrics
         cost = self._calculate_cost(model, input_tokens, output_tokens)
-        self.metrics.setdefault("total_cost", 0)
-        self.metrics["total_cost"] += cost
+        metrics = self.metrics
+        metrics["total_cost"] += cost
         
         # Update call metrics
-        self.metrics.setdefault("total_calls", 0)
-        self.metrics["total_calls"] += 1
-        
+        metrics["total_calls"] += 1
         if success:
-            self.metrics.setdefault("successful_calls", 0)
-            self.metrics["successful_calls"] += 1
+            metrics["successful_calls"] += 1
         else:
-            self.metrics.setdefault("failed_calls", 0)
-            self.metrics["failed_calls"] += 1
-        
-        # Update response time metrics
-        self.metrics.setdefault("response_times", [])
-        self.metrics["response_times"].append(response_time)
+            metrics["failed_calls"] += 1
         
-        # Keep only last 100 response times
-        if len(self.metrics["response_times"]) > 100:
-            self.metrics["response_times"] = self.metrics["response_times"][-100:]
-        
-        # Check thresholds
+        # Update response time metrics, keeping a running sum of the window
+        self._response_time_sum += response_time - self._response_times[self._response_index]
+        self._response_times[self._response_index] = response_time
+        self._response_index = (self._response_index + 1) % RESPONSE_TIME_WINDOW
+        self._response_count = min(self._response_count + 1, RESPONSE_TIME_WINDOW)
+        if self._response_index == 0:
+            # Re-sum once per lap so rounding errors don't accumulate
+            self._response_time_sum = sum(self._response_times)
+    
+    def _check_call_thresholds(self):
+        """Check cost and performance thresholds against the current metrics"""
         self.check_cost_thresholds(self.metrics["total_cost"])
         
         # Calculate error rate
         total_calls = self.metrics["total_calls"]
-        failed_calls = self.metrics.get("failed_calls", 0)
+        failed_calls = self.metrics["failed_calls"]
         error_rate = (failed_calls / total_calls) * 100 if total_calls > 0 else 0
         
         # Calculate average response time
-        avg_response_time = sum(self.metrics["response_times"]) / len(self.metrics["response_times"]) if self.metrics["response_times"] else 0
+        avg_response_time = self._average_response_time()
         
         # Check performance thresholds
         self.check_performance_metrics(avg_response_time, error_rate, 0, 0)  # Memory and CPU would need system monitoring
     
     def _calculate_cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
         """Calculate cost for API call"""
-        model_costs = {
-            "gpt-3.5-turbo": {"input": 0.001, "output": 0.002},
-            "gpt-4": {"input": 0.03, "output": 0.06},
-            "gpt-4-turbo": {"input": 0.01, "output": 0.03}
-        }
-        
-        if model not in model_costs:
-            model = "gpt-3.5-turbo"  # Default to cheapest
-        
-        input_cost = (input_tokens / 1000) * model_costs[model]["input"]
-        output_cost = (output_tokens / 1000) * model_costs[model]["output"]
-        return input_cost + output_cost
+        # Unknown models default to the cheapest
+        input_cost, output_cost = MODEL_TOKEN_COSTS.get(model) or MODEL_TOKEN_COSTS[DEFAULT_PRICING_MODEL]
+        return input_tokens * input_cost + output_tokens * output_cost
     
-    def get_metrics_summary(self) -> Dict[str, Any]:
+    def _average_response_time(self) -> float:
+        """Average of the recent response times"""
+        if not self._response_count:
+            return 0
+        return self._response_time_sum / self._response_count
+    
+    def get_metrics_summary(self) -> MetricsView:
         """Get current metrics summary"""
-        total_calls = self.metrics.get("total_calls", 0)
-        successful_calls = self.metrics.get("successful_calls", 0)
-        failed_calls = self.metrics.get("failed_calls", 0)
-        
-        return {
-            "total_cost": self.metrics.get("total_cost", 0),
-            "total_calls": total_calls,
-            "successful_calls": successful_calls,
-            "failed_calls": failed_calls,
-            "success_rate": (successful_calls / total_calls * 100) if total_calls > 0 else 0,
-            "error_rate": (failed_calls / total_calls * 100) if total_calls > 0 else 0,
-            "average_response_time": sum(self.metrics.get("response_times", [])) / len(self.metrics.get("response_times", [1])) if self.metrics.get("response_times") else 0,
-            "active_alerts": len([a for a in self.alerts if not a.resolved]),
-            "total_alerts": len(self.alerts)
-        }
+        return MetricsView(self)
     
     def get_alerts(self, level: AlertLevel = None, resolved: bool = None) -> List[Alert]:
         """Get alerts with optional filtering"""
-        filtered_alerts = self.alerts
-        
         if level:
-            filtered_alerts = [a for a in filtered_alerts if a.level == level]
-        
-        if resolved is not None:
-            filtered_alerts = [a for a in filtered_alerts if a.resolved == resolved]
+            level_alerts = self._alerts_by_level.get(level, [])
+            if resolved is False and len(self._unresolved_alerts) < len(level_alerts):
+                return [a for a in self._unresolved_alerts.values() if a.level == level]
+            if resolved is None:
+                return list(level_alerts)
+            return [a for a in level_alerts if a.resolved == resolved]
         
-        return filtered_alerts
+        if resolved is False:
+            return list(self._unresolved_alerts.values())
+        if resolved:
+            return [a for a in self.alerts if a.resolved]
+        return self.alerts
     
     def resolve_alert(self, alert_id: str) -> bool:
         """Resolve an alert"""
-        for alert in self.alerts:
-            if alert.id == alert_id:
-                alert.resolved = True
-                alert.resolved_at = datetime.now().isoformat()
-                self.logger.info(f"Resolved alert: {alert_id}")
-                return True
+        alert = self._alerts_by_id.get(alert_id)
+        if alert is None:
+            return False
         
-        return False
+        # Already resolved alerts only have their resolution time refreshed
+        self._unresolved_alerts.pop(alert_id, None)
+        alert.resolved = True
+        alert.resolved_at = _now_iso()
+        self.logger.info("Resolved alert: %s", alert_id)
+        return True
     
     def export_alerts(self, filename: str = None) -> str:
         """Export alerts to a file"""
         if not filename:
             filename = f"alerts_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
-        alerts_data = []
-        for alert in self.alerts:
-            alerts_data.append({
-                "id": alert.id,
-                "level": alert.level.value,
-                "alert_type": alert.alert_type.value,
-                "title": alert.title,
-                "message": alert.message,
-                "timestamp": alert.timestamp,
-                "resolved": alert.resolved,
-                "resolved_at": alert.resolved_at,
-                "metadata": alert.metadata
-            })
-        
-        with open(filename, 'w') as f:
-            json.dump(alerts_data, f, indent=2)
+        # Alerts are written one per line as they are serialized, so the
+        # export never holds the whole document in memory; the temp file and
+        # rename keep readers from ever seeing a partial export
+        alerts = list(self.alerts)
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, 'wb') as f:
+            f.write(b"[")
+            for i, alert in enumerate(alerts):
+                f.write(b",\n" if i else b"\n")
+                f.write(orjson.dumps(alert, option=orjson.OPT_NON_STR_KEYS))
+            f.write(b"\n]\n")
+        os.replace(tmp_filename, filename)
         
-        print(f"✅ Exported {len(alerts_data)} alerts to {filename}")
+        print(f"✅ Exported {len(alerts)} alerts to {filename}")
         return filename
 
 # Example usage and testing
@@ -487,7 +786,7 @@ if __name__ == "__main__":
     
     # Get metrics summary
     summary = monitoring.get_metrics_summary()
-    print("Metrics Summary:", json.dumps(summary, indent=2))
+    print("Metrics Summary:", json.dumps(summary.to_dict(), indent=2))
     
     # Get active alerts
     active_alerts = monitoring.get_alerts(resolved=False)
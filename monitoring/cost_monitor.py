@@ -3,57 +3,185 @@ Cost Monitoring System
 Tracks API usage and costs for budget protection
 """
 
-import json
+import atexit
 import logging
+import os
+import orjson
+import threading
+import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 from pathlib import Path
+from monitoring.pricing import MODEL_TOKEN_COSTS, DEFAULT_PRICING_MODEL
 
 logger = logging.getLogger('phoenix.monitoring.cost')
 
+# Event log size at which it is folded into a new snapshot
+EVENT_LOG_COMPACT_BYTES = 10 * 1024 * 1024
+
 
 class CostMonitor:
     """
     Monitors API usage and costs to prevent budget overruns.
     """
     
-    def __init__(self, budget_file: str = "budget_tracking.json"):
+    def __init__(self, budget_file: str = "budget_tracking.json", save_delay: float = 5.0):
         self.budget_file = Path(budget_file)
+        # Tracked calls are appended here; the budget file is a snapshot of everything before them
+        self.events_file = self.budget_file.with_suffix('.jsonl')
+        self._log_ready = False
         self.budget_data = self._load_budget_data()
+        # Calls are queued as events; a timer appends them at most once per save_delay
+        self.save_delay = save_delay
+        self._pending_events: List[Dict[str, Any]] = []
+        self._dirty = False
+        self._save_timer = None
+        self._save_lock = threading.RLock()
+        atexit.register(self.flush)
+        # Today's usage keys and the local midnight at which they expire
+        self._period_keys = ("", "")
+        self._period_keys_expire = 0.0
         
         # Cost limits (configurable)
         self.daily_limit = 5.0  # $5 per day
         self.monthly_limit = 50.0  # $50 per month
-        self.model_costs = {
-            "gpt-3.5-turbo": {"input": 0.001, "output": 0.002},  # per 1K tokens
-            "gpt-4": {"input": 0.03, "output": 0.06},
-            "gpt-4-turbo": {"input": 0.01, "output": 0.03}
-        }
+        self.token_costs = dict(MODEL_TOKEN_COSTS)  # (input, output) per token
     
     def _load_budget_data(self) -> Dict[str, Any]:
-        """Load budget tracking data from file"""
+        """Load the budget snapshot and replay the events logged after it"""
+        data = None
         if self.budget_file.exists():
             try:
-                with open(self.budget_file, 'r') as f:
-                    return json.load(f)
+                with open(self.budget_file, 'rb') as f:
+                    data = orjson.loads(f.read())
             except Exception as e:
                 logger.error(f"Error loading budget data: {e}")
         
-        # Initialize with default data
-        return {
-            "daily_usage": {},
-            "monthly_usage": {},
-            "total_spent": 0.0,
-            "last_reset": datetime.now().isoformat()
-        }
+        if data is None:
+            # Initialize with default data
+            data = {
+                "daily_usage": {},
+                "monthly_usage": {},
+                "total_spent": 0.0,
+                "last_reset": datetime.now().isoformat()
+            }
+        
+        # The log belongs to the snapshot only if its header carries the snapshot's log ID;
+        # otherwise it was already folded in by a compaction that didn't finish replacing it
+        if data.get("log_id") and self.events_file.exists():
+            try:
+                with open(self.events_file, 'rb') as f:
+                    header = orjson.loads(f.readline() or b'null')
+                    if header and header.get("log_id") == data["log_id"]:
+                        self._log_ready = True
+                        for line in f:
+                            try:
+                                self._apply_event(data, orjson.loads(line))
+                            except ValueError:
+                                logger.warning("Skipping incomplete budget event")
+                                # Appending after a torn line would corrupt the next event
+                                self._log_ready = False
+            except Exception as e:
+                logger.error(f"Error replaying budget events: {e}")
+        
+        return data
+    
+    def _apply_event(self, data: Dict[str, Any], event: Dict[str, Any]):
+        """Add one tracked call to the budget data"""
+        today, this_month = event["ts"][:10], event["ts"][:7]
+        cost, operation = event["cost"], event["operation"]
+        
+        # Daily tracking
+        day = data["daily_usage"].get(today)
+        if day is None:
+            day = data["daily_usage"][today] = {"cost": 0.0, "calls": 0, "operations": {}}
+        
+        day["cost"] += cost
+        day["calls"] += 1
+        
+        operations = day["operations"]
+        operations[operation] = operations.get(operation, 0) + 1
+        
+        models = day.setdefault("models", {})
+        models[event["model"]] = models.get(event["model"], 0) + 1
+        
+        # Monthly tracking
+        month = data["monthly_usage"].get(this_month)
+        if month is None:
+            month = data["monthly_usage"][this_month] = {"cost": 0.0, "calls": 0}
+        
+        month["cost"] += cost
+        month["calls"] += 1
+        
+        # Total spent
+        data["total_spent"] += cost
     
     def _save_budget_data(self):
         """Save budget tracking data to file"""
-        try:
-            with open(self.budget_file, 'w') as f:
-                json.dump(self.budget_data, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving budget data: {e}")
+        # Write a temp file and rename so readers never see a partial file
+        tmp_file = self.budget_file.with_suffix('.tmp')
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(self.budget_data, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_file, self.budget_file)
+    
+    def compact(self):
+        """Write a new snapshot of the budget data and start an empty event log"""
+        with self._save_lock:
+            self._pending_events = []
+            self._dirty = False
+            self._log_ready = False
+            try:
+                log_id = uuid.uuid4().hex
+                self.budget_data["log_id"] = log_id
+                self._save_budget_data()
+                
+                tmp_file = self.events_file.with_suffix('.jsonl.tmp')
+                with open(tmp_file, 'wb') as f:
+                    f.write(orjson.dumps({"log_id": log_id}) + b"\n")
+                os.replace(tmp_file, self.events_file)
+                self._log_ready = True
+            except Exception as e:
+                logger.error(f"Error saving budget data: {e}")
+                self._dirty = True
+    
+    def _schedule_save(self):
+        """Mark budget data dirty and start the save timer if none is pending"""
+        with self._save_lock:
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+    
+    def flush(self):
+        """Write pending changes to disk now"""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            
+            # Without a log matching the snapshot, or once the log is large, fold everything into a snapshot
+            try:
+                oversized = self.events_file.stat().st_size > EVENT_LOG_COMPACT_BYTES
+            except OSError:
+                oversized = True
+            if not self._log_ready or oversized:
+                self.compact()
+                return
+            
+            events, self._pending_events = self._pending_events, []
+            self._dirty = False
+            try:
+                with open(self.events_file, 'ab') as f:
+                    f.write(b"".join(orjson.dumps(event) + b"\n" for event in events))
+            except Exception as e:
+                logger.error(f"Error saving budget events: {e}")
+                # The snapshot written by the next compaction includes these events
+                self._log_ready = False
+                self._dirty = True
     
     def track_api_call(self, 
                       model: str, 
@@ -65,41 +193,31 @@ class CostMonitor:
         Returns cost information and budget status.
         """
         # Calculate cost
-        if model not in self.model_costs:
-            logger.warning(f"Unknown model: {model}, using gpt-3.5-turbo costs")
-            model = "gpt-3.5-turbo"
-        
-        input_cost = (input_tokens / 1000) * self.model_costs[model]["input"]
-        output_cost = (output_tokens / 1000) * self.model_costs[model]["output"]
-        total_cost = input_cost + output_cost
+        costs = self.token_costs.get(model)
+        if costs is None:
+            logger.warning(f"Unknown model: {model}, using {DEFAULT_PRICING_MODEL} costs")
+            model = DEFAULT_PRICING_MODEL
+            costs = self.token_costs[model]
         
-        # Update tracking data
-        today = datetime.now().strftime("%Y-%m-%d")
-        this_month = datetime.now().strftime("%Y-%m")
-        
-        # Daily tracking
-        if today not in self.budget_data["daily_usage"]:
-            self.budget_data["daily_usage"][today] = {"cost": 0.0, "calls": 0, "operations": {}}
-        
-        self.budget_data["daily_usage"][today]["cost"] += total_cost
-        self.budget_data["daily_usage"][today]["calls"] += 1
-        
-        if operation not in self.budget_data["daily_usage"][today]["operations"]:
-            self.budget_data["daily_usage"][today]["operations"][operation] = 0
-        self.budget_data["daily_usage"][today]["operations"][operation] += 1
-        
-        # Monthly tracking
-        if this_month not in self.budget_data["monthly_usage"]:
-            self.budget_data["monthly_usage"][this_month] = {"cost": 0.0, "calls": 0}
+        total_cost = input_tokens * costs[0] + output_tokens * costs[1]
         
-        self.budget_data["monthly_usage"][this_month]["cost"] += total_cost
-        self.budget_data["monthly_usage"][this_month]["calls"] += 1
-        
-        # Total spent
-        self.budget_data["total_spent"] += total_cost
+        event = {
+            "ts": datetime.now().isoformat(),
+            "model": model,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost": total_cost,
+            "operation": operation
+        }
+        today, this_month = event["ts"][:10], event["ts"][:7]
         
-        # Save data
-        self._save_budget_data()
+        with self._save_lock:
+            # Update tracking data
+            self._apply_event(self.budget_data, event)
+            
+            # Save data
+            self._pending_events.append(event)
+            self._schedule_save()
         
         # Check budget status
         budget_status = self._check_budget_status()
@@ -115,10 +233,19 @@ class CostMonitor:
             "monthly_remaining": max(0, self.monthly_limit - self.budget_data["monthly_usage"][this_month]["cost"])
         }
     
+    def _current_period_keys(self) -> Tuple[str, str]:
+        """Today's daily and monthly usage keys, formatted once per day"""
+        now = time.time()
+        if now >= self._period_keys_expire:
+            today = datetime.fromtimestamp(now)
+            midnight = datetime.combine(today.date() + timedelta(days=1), datetime.min.time())
+            self._period_keys = (today.strftime("%Y-%m-%d"), today.strftime("%Y-%m"))
+            self._period_keys_expire = midnight.timestamp()
+        return self._period_keys
+    
     def _check_budget_status(self) -> Dict[str, Any]:
         """Check current budget status and return warnings if needed"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        this_month = datetime.now().strftime("%Y-%m")
+        today, this_month = self._current_period_keys()
         
         daily_cost = self.budget_data["daily_usage"].get(today, {}).get("cost", 0.0)
         monthly_cost = self.budget_data["monthly_usage"].get(this_month, {}).get("cost", 0.0)
@@ -148,47 +275,58 @@ class CostMonitor:
         return status
     
     def get_usage_summary(self, days: int = 7) -> Dict[str, Any]:
-        """Get usage summary for the last N days"""
+        """Get usage summary for the last N days, including today"""
         end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
+        start_date = end_date - timedelta(days=days - 1)
+        # ISO dates sort lexicographically, so the window is a plain string range
+        start_str, end_str = start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
         
         summary = {
-            "period": f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
+            "period": f"{start_str} to {end_str}",
             "total_cost": 0.0,
             "total_calls": 0,
             "daily_breakdown": [],
             "operations": {},
-            "models_used": set()
+            "models_used": []
         }
+        models_used = set()
         
-        for i in range(days):
-            date = (start_date + timedelta(days=i)).strftime("%Y-%m-%d")
-            if date in self.budget_data["daily_usage"]:
-                day_data = self.budget_data["daily_usage"][date]
-                summary["total_cost"] += day_data["cost"]
-                summary["total_calls"] += day_data["calls"]
-                
-                summary["daily_breakdown"].append({
-                    "date": date,
-                    "cost": day_data["cost"],
-                    "calls": day_data["calls"]
-                })
-                
-                # Track operations
-                for operation, count in day_data.get("operations", {}).items():
-                    if operation not in summary["operations"]:
-                        summary["operations"][operation] = 0
-                    summary["operations"][operation] += count
+        with self._save_lock:
+            days_in_window = sorted(
+                (date, day_data) for date, day_data in self.budget_data["daily_usage"].items()
+                if start_str <= date <= end_str
+            )
+        
+        for date, day_data in days_in_window:
+            summary["total_cost"] += day_data["cost"]
+            summary["total_calls"] += day_data["calls"]
+            
+            summary["daily_breakdown"].append({
+                "date": date,
+                "cost": day_data["cost"],
+                "calls": day_data["calls"]
+            })
+            
+            # Track operations
+            for operation, count in day_data.get("operations", {}).items():
+                if operation not in summary["operations"]:
+                    summary["operations"][operation] = 0
+                summary["operations"][operation] += count
+            
+            models_used.update(day_data.get("models", ()))
         
+        summary["models_used"] = sorted(models_used)
         return summary
     
     def reset_daily_budget(self):
         """Reset daily budget (call this daily)"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        if today in self.budget_data["daily_usage"]:
-            del self.budget_data["daily_usage"][today]
-        self.budget_data["last_reset"] = datetime.now().isoformat()
-        self._save_budget_data()
+        today, _ = self._current_period_keys()
+        with self._save_lock:
+            if today in self.budget_data["daily_usage"]:
+                del self.budget_data["daily_usage"][today]
+            self.budget_data["last_reset"] = datetime.now().isoformat()
+            # Deleting usage can't be logged as an event, so take a new snapshot
+            self.compact()
         logger.info("Daily budget reset")
     
     def set_budget_limits(self, daily_limit: float, monthly_limit: float):
@@ -0,0 +1,14 @@
+"""
+Model Pricing
+Per-token OpenAI prices shared by the cost and alert monitors
+"""
+
+# (input, output) price in dollars per token, from the per-1K-token list prices
+MODEL_TOKEN_COSTS = {
+    "gpt-3.5-turbo": (0.001 / 1000, 0.002 / 1000),
+    "gpt-4": (0.03 / 1000, 0.06 / 1000),
+    "gpt-4-turbo": (0.01 / 1000, 0.03 / 1000)
+}
+
+# Model whose prices are used for unknown models
+DEFAULT_PRICING_MODEL = "gpt-3.5-turbo"